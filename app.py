@@ -1,214 +1,403 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import (Flask, render_template, request, redirect, url_for, session, flash, jsonify, g,
+                   has_app_context, get_template_attribute, Response, stream_with_context, send_file, abort)
+from flask.cli import AppGroup
+from markupsafe import Markup
 from werkzeug.security import generate_password_hash, check_password_hash
+import click
 import sqlite3
+import sys
 from functools import wraps
 import os
 from datetime import datetime, date
 import random
 import re
+import json
+import math
+import base64
+import hashlib
+import mimetypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import zlib
 
-app = Flask(__name__)
+# CINEGO_INSTANCE_PATH moves the database and every derived file (benchmarks use a temp dir)
+app = Flask(__name__, instance_path=os.environ.get('CINEGO_INSTANCE_PATH') or None)
 app.secret_key = 'your-secret-key-change-this-in-production'
 app.config['DATABASE'] = os.path.join(app.instance_path, 'cinego.db')
+# Idle request connections kept open for reuse, tuned and with their statement caches warm
+app.config['DB_POOL_SIZE'] = int(os.environ.get('CINEGO_DB_POOL_SIZE', 16))
+# TMDB API and poster base URLs (unset means TMDB itself); point them at
+# benchmarks/fake_tmdb.py for offline runs and load tests
+app.config['TMDB_BASE_URL'] = os.environ.get('CINEGO_TMDB_BASE_URL')
+app.config['TMDB_IMAGE_BASE_URL'] = os.environ.get('CINEGO_TMDB_IMAGE_BASE_URL')
+# Number of parallel TMDB requests used when seeding the catalog
+app.config['TMDB_CONCURRENCY'] = int(os.environ.get('CINEGO_TMDB_CONCURRENCY', 8))
+# On-disk TMDB response cache so rebuilds mostly skip the network
+app.config['TMDB_CACHE_PATH'] = os.environ.get('CINEGO_TMDB_CACHE', os.path.join(app.instance_path, 'tmdb_cache.db'))
+app.config['TMDB_CACHE_MAX_BYTES'] = int(os.environ.get('CINEGO_TMDB_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+# Seconds between background catalog refreshes (0 disables the refresher)
+app.config['CATALOG_REFRESH_INTERVAL'] = int(os.environ.get('CINEGO_CATALOG_REFRESH_INTERVAL', 6 * 3600))
+# Flush buffered view counts every N seconds or once N views are pending
+app.config['VIEW_COUNT_FLUSH_INTERVAL'] = float(os.environ.get('CINEGO_VIEW_COUNT_FLUSH_INTERVAL', 0.5))
+app.config['VIEW_COUNT_MAX_PENDING'] = int(os.environ.get('CINEGO_VIEW_COUNT_MAX_PENDING', 200))
+# Rows per page on the paginated catalog grids
+app.config['PAGE_SIZE'] = int(os.environ.get('CINEGO_PAGE_SIZE', 24))
+# Queue chat history writes on a background thread instead of committing in /chat
+app.config['CHAT_HISTORY_ASYNC'] = os.environ.get('CINEGO_CHAT_HISTORY_ASYNC', '0') == '1'
+# Chat retention: each user's last N messages and anything newer than D days stay
+# in chat_history; older rows are moved into compressed archive chunks
+app.config['CHAT_HISTORY_KEEP_MESSAGES'] = int(os.environ.get('CINEGO_CHAT_HISTORY_KEEP_MESSAGES', 200))
+app.config['CHAT_HISTORY_KEEP_DAYS'] = int(os.environ.get('CINEGO_CHAT_HISTORY_KEEP_DAYS', 30))
+# Seconds between chat archive passes (0 disables the archiver)
+app.config['CHAT_ARCHIVE_INTERVAL'] = int(os.environ.get('CINEGO_CHAT_ARCHIVE_INTERVAL', 3600))
+# Precomputed "recommended" neighbours for the watch pages (similarity.py)
+app.config['SIMILARITY_DIR'] = os.environ.get('CINEGO_SIMILARITY_DIR', os.path.join(app.instance_path, 'similarity'))
+# Seconds between collaborative-filtering retrains from watch_time (0 disables them)
+app.config['RECOMMENDER_TRAIN_INTERVAL'] = int(os.environ.get('CINEGO_RECOMMENDER_TRAIN_INTERVAL', 3600))
+# Short-lived log that carries /events messages between worker processes
+app.config['EVENT_LOG_PATH'] = os.environ.get('CINEGO_EVENT_LOG', os.path.join(app.instance_path, 'events.db'))
+# Resized poster variants fetched from TMDB on first use
+app.config['POSTER_DIR'] = os.environ.get('CINEGO_POSTER_DIR', os.path.join(app.instance_path, 'posters'))
+# Migrate, seed from TMDB, build indexes and start the background jobs at import, only when this
+# process is the dev server (`python app.py`, `flask run`). WSGI imports and every other flask
+# command (init-db, catalog, shell, routes, ...) leave initialization to `flask init-db`.
+# Flask imports the app inside the click context of the command being run.
+_cli_command = click.get_current_context(silent=True)
+app.config['INIT_ON_IMPORT'] = os.environ.get('CINEGO_INIT_ON_IMPORT', '1' if (
+    __name__ == '__main__' or (_cli_command is not None and _cli_command.info_name == 'run')
+) else '0') == '1'
+# Fingerprinted, precompressed copies of static/ (assets.py), rebuilt at startup
+app.config['ASSET_DIR'] = os.environ.get('CINEGO_ASSET_DIR', os.path.join(app.instance_path, 'assets'))
+# Compress HTML/JSON/text responses for clients that send Accept-Encoding
+app.config['COMPRESS_RESPONSES'] = os.environ.get('CINEGO_COMPRESS_RESPONSES', '1') == '1'
+# Max age of the cached homepage rows; view-count ordering can lag this long
+app.config['HOME_CACHE_TTL'] = float(os.environ.get('CINEGO_HOME_CACHE_TTL', 60))
 
 # Ensure instance folder exists
 os.makedirs(app.instance_path, exist_ok=True)
 
 
 from tmdb_client import TMDBClient
+from catalog import fetch_catalog, insert_catalog, get_catalog_version, CatalogRefresher
+from migrations import migrate
+from view_counter import ViewCounter
+from page_cache import VersionedCache
+import chat_matcher
+from recommender import GenreIndex
+from history_writer import HistoryWriter
+from chat_archive import ChatArchiver, load_history_page, history_high_water_mark
+from event_bus import EventBus
+from similarity import SimilarityIndex, build_all as build_similarity, index_path
+from collaborative import RecommendationTrainer
+from poster_cache import PosterCache, VARIANTS as POSTER_VARIANTS, MIMETYPES as POSTER_MIMETYPES, poster_name
+from assets import AssetManifest, build_assets
+from compression import CompressionMiddleware
+from file_lock import FileLock
+from catalog_snapshot import CHUNK_SIZE as CATALOG_CHUNK_SIZE, export_catalog, import_catalog, open_snapshot
+
+TMDBClient.configure_endpoints(app.config['TMDB_BASE_URL'], app.config['TMDB_IMAGE_BASE_URL'])
+TMDBClient.configure_pool(app.config['TMDB_CONCURRENCY'])
+# Only records the settings; each process opens the cache file on first use, so nothing is inherited across a fork
+TMDBClient.configure_cache(app.config['TMDB_CACHE_PATH'], app.config['TMDB_CACHE_MAX_BYTES'])
 
 # ... existing imports ...
 
 
-def get_db():
-    """Get database connection"""
-    conn = sqlite3.connect(app.config['DATABASE'])
+# Connection tuning applied to every SQLite connection
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',
+    'PRAGMA mmap_size=134217728',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+)
+
+
+def connect_db(check_same_thread=True):
+    """Open a new tuned database connection (caller closes it)"""
+    conn = sqlite3.connect(app.config['DATABASE'], cached_statements=256, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
+# Idle request connections; each one serves a single app context at a time
+_db_pool = []
+_db_pool_lock = threading.Lock()
+_db_pool_pid = None
+
+def acquire_db():
+    """Take an idle pooled connection, or open one when none is free"""
+    global _db_pool_pid
+    with _db_pool_lock:
+        if _db_pool_pid != os.getpid():
+            # Connections opened before a fork belong to the parent
+            _db_pool.clear()
+            _db_pool_pid = os.getpid()
+        if _db_pool:
+            return _db_pool.pop()
+    return connect_db(check_same_thread=False)
+
+def release_db(conn, exception=None):
+    """Hand a connection from acquire_db back to the pool, closing it if the pool is full"""
+    try:
+        if exception is not None or conn.in_transaction:
+            # Uncommitted work is discarded, as closing the connection would
+            conn.rollback()
+    except sqlite3.Error:
+        conn.close()
+        return
+    with _db_pool_lock:
+        if _db_pool_pid == os.getpid() and len(_db_pool) < app.config['DB_POOL_SIZE']:
+            _db_pool.append(conn)
+            return
+    conn.close()
+
+def get_db():
+    """Get the database connection for the current app context"""
+    if not has_app_context():
+        return connect_db()
+    if 'db' not in g:
+        g.db = acquire_db()
+    return g.db
+
+def source_digest():
+    """Digest of the app's modules, templates and static files; the same in every process running this code"""
+    digest = hashlib.sha1()
+    paths = [os.path.join(app.root_path, name) for name in os.listdir(app.root_path) if name.endswith('.py')]
+    for folder in (os.path.join(app.root_path, app.template_folder), app.static_folder):
+        for root, _, files in os.walk(folder):
+            paths.extend(os.path.join(root, name) for name in files)
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, app.root_path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Mixed into every ETag so a deploy with new templates or code never matches old copies;
+# derived from the files, so all workers (and their replacements) hand out the same tags
+ETAG_SEED = source_digest()
+
+def etag_matches(*parts):
+    """Give this response a weak ETag built from parts; True if the client already holds it"""
+    if session.get('_flashes'):
+        # A pending flash message must be rendered (and consumed), never answered with a 304
+        return False
+    g.etag = hashlib.sha1(repr((ETAG_SEED, request.full_path, session.get('username')) + parts).encode()).hexdigest()[:24]
+    return request.if_none_match.contains_weak(g.etag)
+
+def not_modified():
+    """Empty 304 for a request whose etag_matches() check passed"""
+    return app.response_class(status=304)
+
+@app.after_request
+def apply_etag(response):
+    """Attach the ETag chosen by etag_matches(); browsers revalidate instead of reusing blindly"""
+    etag = g.get('etag')
+    if etag and response.status_code in (200, 304):
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@app.teardown_appcontext
+def close_db(exception):
+    """Return the app context's database connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        release_db(conn, exception)
+
 def init_db():
-    """Initialize database with tables and sample data from TMDB"""
+    """Migrate the schema and load sample data from TMDB"""
     conn = get_db()
     cursor = conn.cursor()
     
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            email TEXT UNIQUE NOT NULL,
-            password TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create movies table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS movies (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            year INTEGER,
-            genre TEXT,
-            rating REAL,
-            image_url TEXT,
-            description TEXT,
-            is_trending BOOLEAN DEFAULT 0,
-            view_count INTEGER DEFAULT 0,
-            video_url TEXT,
-            trailer_url TEXT
-        )
-    ''')
-    
-    # Create series table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS series (
-            id INTEGER PRIMARY KEY,
-            title TEXT NOT NULL,
-            year INTEGER,
-            genre TEXT,
-            rating REAL,
-            image_url TEXT,
-            description TEXT,
-            seasons INTEGER DEFAULT 1,
-            video_url TEXT,
-            trailer_url TEXT
-        )
-    ''')
-    
-    # Create chat history table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS chat_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            message TEXT NOT NULL,
-            is_bot BOOLEAN DEFAULT 0,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
-    
-    # Create watch time tracking table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS watch_time (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            movie_id INTEGER NOT NULL,
-            date DATE DEFAULT CURRENT_DATE,
-            minutes_watched INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(id),
-            FOREIGN KEY (movie_id) REFERENCES movies(id)
-        )
-    ''')
-    
-    # Create user preferences table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_preferences (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER UNIQUE NOT NULL,
-            favorite_genres TEXT,
-            last_genre_watched TEXT,
-            total_watch_time INTEGER DEFAULT 0,
-            FOREIGN KEY (user_id) REFERENCES users(id)
-        )
-    ''')
+    # Create or upgrade the schema
+    migrate(conn)
     
     # Check if data already exists to avoid refetching
     cursor.execute('SELECT COUNT(*) FROM movies')
     if cursor.fetchone()[0] == 0:
         print("Fetching data from TMDB...")
-        
-        all_movies = {}
-        
-        # Helper to process and add movies
-        def add_movies(movie_list):
-            for m in movie_list:
-                all_movies[m['id']] = m
-        
-        # Fetch multiple pages for better variety
-        print("Fetching Trending...")
-        for page in range(1, 4):
-            add_movies(TMDBClient.fetch_trending_movies(page=page))
-            
-        print("Fetching Top Rated...")
-        for page in range(1, 3):
-            add_movies(TMDBClient.fetch_top_rated_movies(page=page))
-            
-        print("Fetching Now Playing...")
-        for page in range(1, 3):
-            add_movies(TMDBClient.fetch_now_playing_movies(page=page))
-            
-        print("Fetching Action & Comedy...")
-        add_movies(TMDBClient.fetch_action_movies(page=1))
-        add_movies(TMDBClient.fetch_comedy_movies(page=1))
-        
-        # Sort by popularity to find the "best" ones to get trailers for
-        sorted_movies = sorted(all_movies.values(), key=lambda x: x.get('view_count', 0), reverse=True)
-        
-        # Fetch trailers for top 20 movies to keep startup time reasonable but responsive
-        print("Fetching trailers for top movies...")
-        count = 0
-        for movie_data in sorted_movies:
-            if count < 20: 
-                video_data = TMDBClient.fetch_movie_videos(movie_data['id'])
-                if video_data:
-                    # We store the URL in trailer_url mostly, but could use video_url if it's a "clip" acting as a movie
-                    movie_data['trailer_url'] = video_data['url']
-                count += 1
-            
-            # Insert into DB
-            cursor.execute('''
-                INSERT OR IGNORE INTO movies (id, title, year, genre, rating, image_url, description, is_trending, view_count, video_url, trailer_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                movie_data['id'], 
-                movie_data['title'], 
-                movie_data['year'], 
-                movie_data['genre'], 
-                movie_data['rating'], 
-                movie_data['image_url'], 
-                movie_data['description'], 
-                movie_data.get('is_trending', 0), 
-                movie_data['view_count'], 
-                movie_data['video_url'], 
-                movie_data.get('trailer_url', '')
-            ))
-            
-        # Fetch series (more pages)
-        print("Fetching Series...")
-        all_series = []
-        for page in range(1, 4):
-            all_series.extend(TMDBClient.fetch_popular_series(page=page))
-
-        print(f"Fetching videos for {len(all_series)} series...")
-        for s in all_series:
-            # Fetch video for ALL series as requested
-            video_data = TMDBClient.fetch_series_videos(s['id'])
-            trailer_url = video_data['url'] if video_data else ''
-
-            cursor.execute('''
-                INSERT OR IGNORE INTO series (id, title, year, genre, rating, image_url, description, seasons, video_url, trailer_url)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                s.get('id'), # Use TMDB ID
-                s['title'], 
-                s['year'], 
-                s['genre'], 
-                s['rating'], 
-                s['image_url'], 
-                s['description'], 
-                s['seasons'],
-                '', # video_url (empty for now)
-                trailer_url
-            ))
-            
-        print(f"Database initialized with {len(all_movies)} movies and {len(all_series)} series data.")
+        movies, series = fetch_catalog(app.config['TMDB_CONCURRENCY'])
+        insert_catalog(conn, movies, series)
+        print(f"Database initialized with {len(movies)} movies and {len(series)} series data.")
         
     conn.commit()
-    conn.close()
 
-# Initialize database on first run
-with app.app_context():
-    init_db()
+def rebuild_similarity():
+    """Rebuild the watch-page neighbour tables for titles that changed since the last build"""
+    conn = connect_db()
+    try:
+        report = build_similarity(conn, app.config['SIMILARITY_DIR'])
+    except Exception as e:
+        print(f"Similarity index error: {str(e)}")
+        return
+    finally:
+        conn.close()
+    m, s = report['movies'], report['series']
+    if m['rebuilt'] or s['rebuilt']:
+        print(f"Similarity index: {m['rows']} movies ({m['rescored']} rescored, {m['vectorized']} vectorized), "
+              f"{s['rows']} series ({s['rescored']} rescored, {s['vectorized']} vectorized) in {report['seconds']}s")
+
+similar_movies = SimilarityIndex(index_path(app.config['SIMILARITY_DIR'], 'movies'))
+similar_series = SimilarityIndex(index_path(app.config['SIMILARITY_DIR'], 'series'))
+
+# Keep trending flags, ratings and new releases current without a DB reset
+catalog_refresher = CatalogRefresher(connect_db, app.config['CATALOG_REFRESH_INTERVAL'],
+                                     concurrency=app.config['TMDB_CONCURRENCY'],
+                                     after_refresh=rebuild_similarity)
+
+# Page views are buffered and written in batches instead of one UPDATE per hit
+view_counter = ViewCounter(connect_db, app.config['VIEW_COUNT_FLUSH_INTERVAL'], app.config['VIEW_COUNT_MAX_PENDING'])
+
+# Homepage catalog rows, rebuilt when the catalog version changes
+home_cache = VersionedCache(ttl=app.config['HOME_CACHE_TTL'])
+
+# Background writer used when CHAT_HISTORY_ASYNC is on
+history_writer = HistoryWriter(connect_db)
+
+# Move chat history past the retention window into the archive table
+chat_archiver = ChatArchiver(connect_db, app.config['CHAT_ARCHIVE_INTERVAL'],
+                             app.config['CHAT_HISTORY_KEEP_MESSAGES'], app.config['CHAT_HISTORY_KEEP_DAYS'])
+
+# Server-sent events per user: streamed CineBot replies and watch-time warnings
+event_bus = EventBus(app.config['EVENT_LOG_PATH'])
+# Streamed CineBot replies are generated here, so /chat returns before the first piece
+chat_replies = ThreadPoolExecutor(max_workers=4, thread_name_prefix='cinebot-reply')
+
+# Per-user "Because you watched" picks, trained in the background from watch_time
+recommendation_trainer = RecommendationTrainer(connect_db, app.config['RECOMMENDER_TRAIN_INTERVAL'])
+
+# Local poster variants served with immutable caching
+poster_cache = PosterCache(app.config['POSTER_DIR'], TMDBClient.IMAGE_BASE_URL.rsplit('/', 1)[0])
+
+# Static files under content-hashed names; templates link them through asset_url_for
+asset_manifest = AssetManifest(app.config['ASSET_DIR'])
+
+if app.config['COMPRESS_RESPONSES']:
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app)
+
+# Host-wide locks: one process initializes at a time, one process runs the background jobs,
+# one process builds the static assets at a time
+init_lock = FileLock(os.path.join(app.instance_path, 'init.lock'))
+jobs_lock = FileLock(os.path.join(app.instance_path, 'jobs.lock'))
+assets_lock = FileLock(os.path.join(app.instance_path, 'assets.lock'))
+
+def initialize():
+    """Migrate and seed the database, then build the similarity index and static assets
+
+    Runs under init_lock, so processes started together take turns; everyone
+    after the first finds the schema current, the catalog seeded and the
+    derived files unchanged.
+    """
+    with init_lock:
+        with app.app_context():
+            init_db()
+        rebuild_similarity()
+        build_static_assets()
+
+def build_static_assets():
+    """Fingerprint and precompress static/ and rewrite the manifest
+
+    Cheap when nothing changed (unchanged files are skipped), so every worker
+    calls it on start: after a SIGHUP reload the new workers publish the
+    current static files before they serve pages that link them.
+    """
+    with assets_lock:
+        try:
+            report = build_assets(app.static_folder, app.config['ASSET_DIR'])
+            if report['written']:
+                print(f"Assets: {report['written']} of {report['assets']} fingerprinted, "
+                      f"{report['compressed']} precompressed")
+        except Exception as e:
+            print(f"Asset build error: {str(e)}")
+
+def start_background_jobs():
+    """Start the catalog refresher, chat archiver and recommendation trainer in one process
+
+    Every worker calls this; whichever holds jobs_lock runs the jobs, and the
+    others wait on it in a daemon thread to take over if that worker exits.
+    """
+    def start():
+        if app.config['CATALOG_REFRESH_INTERVAL'] > 0:
+            catalog_refresher.start()
+        if app.config['CHAT_ARCHIVE_INTERVAL'] > 0:
+            chat_archiver.start()
+        if app.config['RECOMMENDER_TRAIN_INTERVAL'] > 0:
+            recommendation_trainer.start()
+        print(f"Background jobs running in process {os.getpid()}")
+
+    def wait_and_start():
+        jobs_lock.acquire()
+        start()
+
+    if jobs_lock.acquire(blocking=False):
+        start()
+    else:
+        threading.Thread(target=wait_and_start, name='background-jobs-standby', daemon=True).start()
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Migrate the schema, seed the catalog and build indexes and assets (once per deployment)"""
+    initialize()
+    print('Initialization complete.')
+
+catalog_cli = AppGroup('catalog', help='Move the movie/series catalog in and out as NDJSON snapshots.')
+app.cli.add_command(catalog_cli)
+
+def open_catalog_snapshot(path, mode, compression):
+    """open_snapshot for the catalog commands: a missing file or codec is a one-line error, not a traceback"""
+    try:
+        return open_snapshot(path, mode, compression)
+    except (OSError, RuntimeError) as e:
+        raise click.ClickException(str(e))
+
+@catalog_cli.command('export')
+@click.argument('path', default='-')
+@click.option('--compression', type=click.Choice(['none', 'gzip', 'zstd']),
+              help='Defaults from the file extension (.gz, .zst).')
+def catalog_export_command(path, compression):
+    """Write every movie and series to PATH (or stdout) as NDJSON"""
+    conn = connect_db()
+    try:
+        with open_catalog_snapshot(path, 'w', compression) as out:
+            counts = export_catalog(conn, out)
+    finally:
+        conn.close()
+    # stdout may be the snapshot itself
+    print(f"Exported {counts['movies']} movies and {counts['series']} series.", file=sys.stderr)
+
+@catalog_cli.command('import')
+@click.argument('path', default='-')
+@click.option('--compression', type=click.Choice(['none', 'gzip', 'zstd']),
+              help='Defaults from the file extension (.gz, .zst).')
+@click.option('--chunk-size', default=CATALOG_CHUNK_SIZE, show_default=True, help='Rows per executemany call.')
+@click.option('--similarity/--no-similarity', default=False, show_default=True,
+              help='Also update the watch-page similarity index (all-pairs scoring on a fresh catalog; '
+                   'otherwise the next init-db or catalog refresh does it).')
+def catalog_import_command(path, compression, chunk_size, similarity):
+    """Load movies and series from an NDJSON snapshot at PATH (or stdin), no TMDB access needed"""
+    with init_lock:
+        conn = connect_db()
+        try:
+            migrate(conn)
+            with open_catalog_snapshot(path, 'r', compression) as lines:
+                counts = import_catalog(conn, lines, chunk_size)
+        except ValueError as e:
+            raise click.ClickException(f'Import rolled back: {e}')
+        finally:
+            conn.close()
+        print(f"Imported {counts['movies']} movies and {counts['series']} series in {counts['seconds']}s.")
+        if similarity:
+            rebuild_similarity()
+
+if app.config['INIT_ON_IMPORT']:
+    initialize()
+    start_background_jobs()
+
+# Derived catalog structures (CineBot's genre index), rebuilt per catalog version
+catalog_cache = VersionedCache()
 
 # ================== CINEBOT AI ENGINE ==================
 
@@ -216,35 +405,10 @@ class CineBot:
     """Smart movie recommendation chatbot"""
     
     # Genre mappings for mood-based recommendations
-    MOOD_GENRE_MAP = {
-        'happy': ['Comedy', 'Adventure', 'Fantasy'],
-        'sad': ['Drama', 'Romance'],
-        'excited': ['Action', 'Sci-Fi', 'Thriller'],
-        'scared': ['Horror', 'Mystery', 'Thriller'],
-        'romantic': ['Romance', 'Drama'],
-        'adventurous': ['Adventure', 'Action', 'Fantasy'],
-        'thoughtful': ['Drama', 'Sci-Fi', 'Mystery'],
-        'relaxed': ['Comedy', 'Romance', 'Adventure'],
-        'tense': ['Thriller', 'Horror', 'Crime']
-    }
+    MOOD_GENRE_MAP = chat_matcher.MOOD_GENRE_MAP
     
     # Genre keywords for detection
-    GENRE_KEYWORDS = {
-        'action': 'Action',
-        'comedy': 'Comedy',
-        'drama': 'Drama',
-        'horror': 'Horror',
-        'scifi': 'Sci-Fi',
-        'sci-fi': 'Sci-Fi',
-        'science fiction': 'Sci-Fi',
-        'romance': 'Romance',
-        'thriller': 'Thriller',
-        'mystery': 'Mystery',
-        'adventure': 'Adventure',
-        'fantasy': 'Fantasy',
-        'crime': 'Crime',
-        'war': 'War'
-    }
+    GENRE_KEYWORDS = chat_matcher.GENRE_KEYWORDS
     
     # Personality responses
     GREETINGS = [
@@ -261,85 +425,64 @@ class CineBot:
         300: "5 hours! Time flies when you're having fun, but maybe grab some water? 💧"
     }
     
+    @staticmethod
+    def analyze(message):
+        """Return (intent, genre, mood) for a message in a single matcher pass"""
+        return chat_matcher.default_matcher.match(message)
+    
     @staticmethod
     def detect_intent(message):
         """Detect user intent from message"""
-        message = message.lower()
-        
-        # Greetings
-        if any(word in message for word in ['hi', 'hello', 'hey', 'greetings']):
-            return 'greeting'
-        
-        # Recommendations
-        if any(word in message for word in ['recommend', 'suggest', 'find', 'looking for', 'want to watch', 'show me']):
-            return 'recommend'
-        
-        # Mood-based
-        if any(word in message for word in ['feel', 'mood', 'feeling', 'vibe']):
-            return 'mood'
-        
-        # Watch time
-        if any(word in message for word in ['watched', 'watch time', 'how long', 'how much']):
-            return 'watch_time'
-        
-        # Help
-        if any(word in message for word in ['help', 'what can you do', 'commands']):
-            return 'help'
-        
-        return 'general'
+        return CineBot.analyze(message)[0]
     
     @staticmethod
     def extract_genre(message):
         """Extract genre from message"""
-        message = message.lower()
-        for keyword, genre in CineBot.GENRE_KEYWORDS.items():
-            if keyword in message:
-                return genre
-        return None
+        return CineBot.analyze(message)[1]
     
     @staticmethod
     def extract_mood(message):
         """Extract mood from message"""
-        message = message.lower()
-        for mood in CineBot.MOOD_GENRE_MAP.keys():
-            if mood in message:
-                return mood
-        return None
+        return CineBot.analyze(message)[2]
+    
+    @staticmethod
+    def get_genre_index():
+        """Ranked per-genre/per-mood movie lists for the current catalog version"""
+        conn = get_db()
+        return catalog_cache.get('genre_index', get_catalog_version(conn),
+                                 lambda: GenreIndex.build(conn, CineBot.MOOD_GENRE_MAP))
+    
+    @staticmethod
+    def get_watched_ids(user_id):
+        """Ids of every title the user has watch time recorded for"""
+        cursor = get_db().cursor()
+        cursor.execute('SELECT DISTINCT movie_id FROM watch_time WHERE user_id = ?', (user_id,))
+        return {row[0] for row in cursor.fetchall()}
     
     @staticmethod
     def get_recommendations(genre=None, mood=None, user_id=None, limit=3):
         """Get movie recommendations based on criteria"""
+        watched = CineBot.get_watched_ids(user_id) if user_id else set()
+        if user_id and not genre and not mood:
+            personal = CineBot.get_personal_recommendations(user_id, exclude=watched, limit=limit)
+            if personal:
+                return personal
+        return CineBot.get_genre_index().top(genre=genre, mood=mood, exclude=watched, limit=limit)
+    
+    @staticmethod
+    def get_personal_recommendations(user_id, exclude=(), limit=20):
+        """Precomputed collaborative picks for a user, each with the watched title behind it"""
         conn = get_db()
-        cursor = conn.cursor()
-        
-        # Determine genres to search
-        genres_to_search = []
-        if genre:
-            genres_to_search = [genre]
-        elif mood and mood in CineBot.MOOD_GENRE_MAP:
-            genres_to_search = CineBot.MOOD_GENRE_MAP[mood]
-        
-        # Build query
-        if genres_to_search:
-            placeholders = ','.join(['?' for _ in genres_to_search])
-            query = f'''
-                SELECT * FROM movies 
-                WHERE genre IN ({placeholders})
-                ORDER BY rating DESC, view_count DESC
-                LIMIT ?
-            '''
-            cursor.execute(query, genres_to_search + [limit])
-        else:
-            # Random top-rated movies
-            cursor.execute('''
-                SELECT * FROM movies 
-                ORDER BY rating DESC, view_count DESC
-                LIMIT ?
-            ''', (limit,))
-        
-        movies = cursor.fetchall()
-        conn.close()
-        return movies
+        rows = conn.execute('''
+            SELECT m.*, b.title AS because_title, r.because_id
+            FROM user_recommendations r
+            JOIN movies m ON m.id = r.movie_id
+            JOIN movies b ON b.id = r.because_id
+            WHERE r.user_id = ?
+            ORDER BY r.rank
+        ''', (user_id,)).fetchall()
+        exclude = set(exclude)
+        return [dict(row) for row in rows if row['id'] not in exclude][:limit]
     
     @staticmethod
     def get_watch_time_today(user_id):
@@ -347,44 +490,30 @@ class CineBot:
         conn = get_db()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT SUM(minutes_watched) 
-            FROM watch_time 
+            SELECT minutes_watched
+            FROM watch_time_daily
             WHERE user_id = ? AND date = ?
         ''', (user_id, date.today()))
         result = cursor.fetchone()
-        conn.close()
-        return result[0] if result[0] else 0
+        return result[0] if result and result[0] else 0
     
     @staticmethod
     def update_watch_time(user_id, movie_id, minutes):
         """Update user's watch time"""
+        CineBot.record_heartbeats(user_id, [(movie_id, minutes)])
+    
+    @staticmethod
+    def record_heartbeats(user_id, heartbeats):
+        """Add (movie_id, minutes) heartbeats to today's watch time in one transaction"""
         conn = get_db()
-        cursor = conn.cursor()
-        
-        # Check if entry exists for today
-        cursor.execute('''
-            SELECT id, minutes_watched FROM watch_time
-            WHERE user_id = ? AND movie_id = ? AND date = ?
-        ''', (user_id, movie_id, date.today()))
-        
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing
-            cursor.execute('''
-                UPDATE watch_time 
-                SET minutes_watched = minutes_watched + ?
-                WHERE id = ?
-            ''', (minutes, existing[0]))
-        else:
-            # Insert new
-            cursor.execute('''
+        today = date.today()
+        with conn:
+            conn.executemany('''
                 INSERT INTO watch_time (user_id, movie_id, date, minutes_watched)
                 VALUES (?, ?, ?, ?)
-            ''', (user_id, movie_id, date.today(), minutes))
-        
-        conn.commit()
-        conn.close()
+                ON CONFLICT (user_id, movie_id, date)
+                DO UPDATE SET minutes_watched = minutes_watched + excluded.minutes_watched
+            ''', [(user_id, movie_id, today, minutes) for movie_id, minutes in heartbeats])
     
     @staticmethod
     def get_watch_time_warning(total_minutes):
@@ -394,52 +523,66 @@ class CineBot:
                 return warning
         return None
     
+    @staticmethod
+    def get_crossed_warning(before_minutes, after_minutes):
+        """Get the warning for the highest threshold crossed between two watch-time totals"""
+        crossed = [threshold for threshold in CineBot.WATCH_TIME_WARNINGS
+                   if before_minutes < threshold <= after_minutes]
+        return CineBot.WATCH_TIME_WARNINGS[max(crossed)] if crossed else None
+    
     @staticmethod
     def save_chat_message(user_id, message, is_bot=False):
         """Save chat message to history"""
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO chat_history (user_id, message, is_bot)
-            VALUES (?, ?, ?)
-        ''', (user_id, message, is_bot))
-        conn.commit()
-        conn.close()
+        CineBot.save_chat_messages(user_id, [(message, is_bot)])
     
     @staticmethod
-    def get_chat_history(user_id, limit=20):
-        """Get recent chat history"""
+    def save_chat_messages(user_id, messages):
+        """Save (message, is_bot) pairs to history in one transaction, or hand them to the async writer"""
+        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        rows = [(user_id, message, is_bot, now) for message, is_bot in messages]
+        if app.config['CHAT_HISTORY_ASYNC']:
+            history_writer.append(rows)
+            return
         conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT message, is_bot, timestamp
-            FROM chat_history
-            WHERE user_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (user_id, limit))
-        messages = cursor.fetchall()
-        conn.close()
-        return list(reversed(messages))
+        with conn:
+            conn.executemany(HistoryWriter.INSERT_SQL, rows)
+    
+    @staticmethod
+    def get_chat_history(user_id, limit=20, before=None):
+        """Get a page of chat history older than message id `before`, oldest first, and the next cursor"""
+        messages, next_before = load_history_page(get_db(), user_id, before, limit)
+        return list(reversed(messages)), next_before
+    
+    @staticmethod
+    def get_chat_high_water_mark(user_id):
+        """Newest chat message id for the user; history pages only change when it grows"""
+        return history_high_water_mark(get_db(), user_id)
     
     @staticmethod
     def generate_response(message, user_id):
         """Generate bot response based on message"""
-        intent = CineBot.detect_intent(message)
+        return ''.join(CineBot.iter_response(message, user_id))
+    
+    @staticmethod
+    def iter_response(message, user_id):
+        """Yield the bot response in pieces as each one is ready"""
+        intent, genre, mood = CineBot.analyze(message)
         
         # Greeting
         if intent == 'greeting':
-            return random.choice(CineBot.GREETINGS)
+            yield random.choice(CineBot.GREETINGS)
+            return
         
         # Help
         if intent == 'help':
-            return """I can help you with:
+            yield """I can help you with:
 🎬 Movie recommendations (by genre or mood)
 ⏱️ Track your watch time
 💡 Suggest what to watch next
 
 Try asking: "Recommend an action movie" or "I feel happy, what should I watch?"
 """
+            return
         
         # Watch time
         if intent == 'watch_time':
@@ -454,35 +597,36 @@ Try asking: "Recommend an action movie" or "I feel happy, what should I watch?"
             else:
                 response += "Keep enjoying! 🍿"
             
-            return response
+            yield response
+            return
         
         # Recommendations
         if intent in ['recommend', 'mood']:
-            genre = CineBot.extract_genre(message)
-            mood = CineBot.extract_mood(message)
-            
             movies = CineBot.get_recommendations(genre, mood, user_id, limit=3)
             
             if not movies:
-                return "Hmm, I couldn't find movies matching that. Try asking for Action, Drama, Sci-Fi, or tell me your mood!"
+                yield "Hmm, I couldn't find movies matching that. Try asking for Action, Drama, Sci-Fi, or tell me your mood!"
+                return
             
-            # Build response
-            if genre:
-                response = f"Perfect! Here are top {genre} movies for you:\n\n"
+            # Header first, then one line per movie
+            if 'because_title' in movies[0]:
+                yield f"Because you watched {movies[0]['because_title']}, you might like:\n\n"
+            elif genre:
+                yield f"Perfect! Here are top {genre} movies for you:\n\n"
             elif mood:
-                response = f"Feeling {mood}? These should hit the spot:\n\n"
+                yield f"Feeling {mood}? These should hit the spot:\n\n"
             else:
-                response = "Here are some top picks for you:\n\n"
+                yield "Here are some top picks for you:\n\n"
             
             for i, movie in enumerate(movies, 1):
-                response += f"{i}. **{movie['title']}** ({movie['year']}) ⭐ {movie['rating']}/10\n"
-                response += f"   {movie['description']}\n\n"
+                yield (f"{i}. **{movie['title']}** ({movie['year']}) ⭐ {movie['rating']}/10\n"
+                       f"   {movie['description']}\n\n")
             
-            response += "Click any movie to start watching! 🎬"
-            return response
+            yield "Click any movie to start watching! 🎬"
+            return
         
         # General conversation
-        return "I'm CineBot! Ask me to recommend movies, check your watch time, or just tell me what mood you're in! 😊"
+        yield "I'm CineBot! Ask me to recommend movies, check your watch time, or just tell me what mood you're in! 😊"
 
 # ================== END CINEBOT AI ENGINE ==================
 
@@ -496,18 +640,14 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-@app.route('/')
-def index():
-    """Homepage with all movies and series"""
-    if 'user_id' not in session:
-        return redirect(url_for('login'))
-    
-    conn = get_db()
+def render_home_rows(conn):
+    """Render the catalog part of the homepage (everything but the user header)"""
     cursor = conn.cursor()
     
-    # Get all movies
-    cursor.execute('SELECT * FROM movies ORDER BY view_count DESC')
-    all_movies = cursor.fetchall()
+    # First page of all movies; the rest loads as the user scrolls
+    all_movies, next_cursor = fetch_page(conn, 'movies', 'views')
+    cursor.execute('SELECT COUNT(*) FROM movies')
+    total_movies = cursor.fetchone()[0]
     
     # Get trending movies
     cursor.execute('SELECT * FROM movies WHERE is_trending = 1 ORDER BY view_count DESC LIMIT 10')
@@ -518,17 +658,40 @@ def index():
     latest = cursor.fetchall()
     
     # Get series
-    cursor.execute('SELECT * FROM series ORDER BY rating DESC')
+    cursor.execute(f"SELECT * FROM series ORDER BY {sort_key('rating')} DESC")
     series = cursor.fetchall()
     
-    conn.close()
+    return Markup(render_template('_home_rows.html',
+                                  all_movies=all_movies,
+                                  next_cursor=next_cursor,
+                                  total_movies=total_movies,
+                                  trending=trending,
+                                  latest=latest,
+                                  series=series))
+
+@app.route('/')
+def index():
+    """Homepage with all movies and series"""
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    
+    conn = get_db()
+    home_rows = home_cache.get('home_rows', get_catalog_version(conn), lambda: render_home_rows(conn))
+    picks = CineBot.get_personal_recommendations(session['user_id'])
+    
+    # The cached rows already carry the catalog version (and view-count ordering); only the
+    # user's picks are rendered per request
+    if etag_matches(zlib.crc32(home_rows.encode()), [movie['id'] for movie in picks]):
+        return not_modified()
     
-    return render_template('index.html', 
-                         all_movies=all_movies,
-                         trending=trending,
-                         latest=latest,
-                         series=series,
-                         username=session.get('username'))
+    # Group the user's picks by the watched title behind them, best group first
+    because_rows = {}
+    for movie in picks:
+        row = because_rows.setdefault(movie['because_id'], {'title': movie['because_title'], 'movies': []})
+        row['movies'].append(movie)
+    
+    return render_template('index.html', home_rows=home_rows, because_rows=list(because_rows.values())[:2],
+                           username=session.get('username'))
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -544,7 +707,6 @@ def login():
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
         user = cursor.fetchone()
-        conn.close()
         
         if user and check_password_hash(user['password'], password):
             session['user_id'] = user['id']
@@ -580,10 +742,10 @@ def register():
             cursor.execute('INSERT INTO users (username, email, password) VALUES (?, ?, ?)',
                          (username, email, hashed_password))
             conn.commit()
-            conn.close()
             flash('Registration successful! Please login.', 'success')
             return redirect(url_for('login'))
         except sqlite3.IntegrityError:
+            conn.rollback()
             flash('Username or email already exists', 'error')
     
     return render_template('register.html')
@@ -595,29 +757,236 @@ def logout():
     flash('You have been logged out', 'info')
     return redirect(url_for('login'))
 
+# Keyset-paginated catalog orderings: (table, order name) -> sort column.
+# Ties are broken by id so every row has a stable position.
+PAGE_ORDERS = {
+    ('movies', 'rating'): 'rating',
+    ('movies', 'views'): 'view_count',
+    ('series', 'rating'): 'rating',
+}
+
+# A NULL sort column pages as this value, after every real rating or count;
+# the keyset indexes (migration 11) are built on the same expression
+NULL_SORT_VALUE = -1
+
+def sort_key(column):
+    """SQL expression a keyset ordering sorts and compares on"""
+    return f'COALESCE({column}, {NULL_SORT_VALUE})'
+
+def encode_cursor(row, column):
+    """Opaque cursor pointing just past row in a (column DESC, id DESC) ordering"""
+    value = row[column] if row[column] is not None else NULL_SORT_VALUE
+    raw = json.dumps([value, row['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+# Largest integer SQLite can bind; anything past it raises OverflowError at execute time
+SQLITE_MAX_INT = 2 ** 63 - 1
+
+def sqlite_number(value):
+    """True for an int SQLite can bind, or a finite float"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return -SQLITE_MAX_INT - 1 <= value <= SQLITE_MAX_INT
+    return isinstance(value, float) and math.isfinite(value)
+
+def decode_cursor(token):
+    """Decode a cursor from encode_cursor; raises ValueError if it is malformed"""
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    value, row_id = json.loads(raw)
+    if not isinstance(row_id, int) or not sqlite_number(row_id) or not sqlite_number(value):
+        raise ValueError('bad cursor')
+    return value, row_id
+
+def fetch_page(conn, table, order, after=None, limit=None):
+    """Return (rows, next_cursor) for one keyset page of a catalog table"""
+    column = PAGE_ORDERS[(table, order)]
+    limit = limit or app.config['PAGE_SIZE']
+    key = sort_key(column)
+    query = f'SELECT * FROM {table}'
+    params = []
+    if after:
+        value, row_id = decode_cursor(after)
+        # The plain bound lets SQLite seek the expression index instead of scanning it
+        query += f' WHERE {key} <= ? AND ({key}, id) < (?, ?)'
+        params.extend((value, value, row_id))
+    query += f' ORDER BY {key} DESC, id DESC LIMIT ?'
+    params.append(limit + 1)
+    
+    rows = conn.execute(query, params).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1], column) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def page_response(table, kind):
+    """JSON response for a catalog page request (?order=&after=&limit=&html=1)"""
+    order = request.args.get('order', 'rating')
+    if (table, order) not in PAGE_ORDERS:
+        return jsonify({'error': 'Unknown order'}), 400
+    limit = min(max(request.args.get('limit', app.config['PAGE_SIZE'], type=int), 1), 100)
+    conn = get_db()
+    try:
+        rows, next_cursor = fetch_page(conn, table, order, request.args.get('after'), limit)
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid cursor'}), 400
+    
+    # View-count flushes do not bump the catalog version, yet they change the items (and,
+    # for the views order, which titles are on the page), so the page itself goes in the ETag
+    items = [dict(row) for row in rows]
+    if etag_matches(get_catalog_version(conn), zlib.crc32(json.dumps(items).encode())):
+        return not_modified()
+    
+    result = {'items': items, 'next_cursor': next_cursor, 'success': True}
+    if request.args.get('html'):
+        page_cards = get_template_attribute('_cards.html', 'page_cards')
+        result['html'] = str(page_cards(rows, kind, request.args.get('badge', 'TRENDING')))
+    return jsonify(result)
+
 @app.route('/movies')
 @login_required
 def movies():
     """Movies page"""
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM movies ORDER BY rating DESC')
-    all_movies = cursor.fetchall()
-    conn.close()
+    if etag_matches(get_catalog_version(conn)):
+        return not_modified()
+    all_movies, next_cursor = fetch_page(conn, 'movies', 'rating')
+    total = conn.execute('SELECT COUNT(*) FROM movies').fetchone()[0]
     
-    return render_template('movies.html', movies=all_movies, username=session.get('username'))
+    return render_template('movies.html', movies=all_movies, next_cursor=next_cursor, total=total,
+                           username=session.get('username'))
+
+@app.route('/movies/page')
+@login_required
+def movies_page():
+    """Next page of movies for infinite scroll"""
+    return page_response('movies', 'movie')
 
 @app.route('/series')
 @login_required
 def series_page():
     """Series page"""
     conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM series ORDER BY rating DESC')
-    all_series = cursor.fetchall()
-    conn.close()
+    if etag_matches(get_catalog_version(conn)):
+        return not_modified()
+    all_series, next_cursor = fetch_page(conn, 'series', 'rating')
+    total = conn.execute('SELECT COUNT(*) FROM series').fetchone()[0]
     
-    return render_template('series.html', series=all_series, username=session.get('username'))
+    return render_template('series.html', series=all_series, next_cursor=next_cursor, total=total,
+                           username=session.get('username'))
+
+@app.route('/series/page')
+@login_required
+def series_page_json():
+    """Next page of series for infinite scroll"""
+    return page_response('series', 'series')
+
+def fts_query(text):
+    """Turn free text into an FTS5 query that prefix-matches every word"""
+    words = re.findall(r'\w+', text.lower())
+    return ' '.join(f'"{word}"*' for word in words[:8])
+
+def asset_url_for(endpoint, **values):
+    """url_for that sends static files to their fingerprinted copy (plain /static in debug mode)"""
+    if endpoint == 'static' and not app.debug:
+        hashed = asset_manifest.hashed(values.get('filename', ''))
+        if hashed:
+            values['filename'] = hashed
+            return url_for('asset', **values)
+    return url_for(endpoint, **values)
+
+# Templates (and macros imported without context) resolve url_for from the Jinja globals
+app.jinja_env.globals['url_for'] = asset_url_for
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    """Fingerprinted static file, precompressed when the client accepts it; cacheable forever"""
+    found = asset_manifest.resolve(filename, request.headers.get('Accept-Encoding', ''))
+    if found is None:
+        abort(404)
+    path, encoding = found
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         max_age=365 * 24 * 3600, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.template_global()
+def poster_urls(image_url):
+    """Local poster URLs for an image_url ({'src': {variant: url}, 'srcset': {fmt: ...}}), or None"""
+    name = poster_name(image_url)
+    if name is None:
+        return None
+    urls = {'src': {}, 'srcset': {}}
+    for fmt in poster_cache.formats:
+        entries = []
+        for variant, width in POSTER_VARIANTS.items():
+            url = url_for('poster', variant=variant, name=name, fmt=fmt)
+            entries.append(f'{url} {width}w')
+            if fmt == 'jpg':
+                urls['src'][variant] = url
+        urls['srcset'][fmt] = ', '.join(entries)
+    return urls
+
+@app.route('/posters/<variant>/<name>.<fmt>')
+def poster(variant, name, fmt):
+    """Resized poster variant; the URL is tied to TMDB's file name so it can be cached forever"""
+    if variant not in POSTER_VARIANTS or fmt not in poster_cache.formats:
+        abort(404)
+    path = poster_cache.get(variant, name, fmt)
+    if path is None:
+        # Cached briefly only: the poster may become available later
+        response = redirect(asset_url_for('static', filename='images/poster-placeholder.svg'))
+        response.headers['Cache-Control'] = 'public, max-age=600'
+        return response
+    response = send_file(path, mimetype=POSTER_MIMETYPES[fmt], max_age=365 * 24 * 3600, conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/search')
+@login_required
+def search():
+    """Ranked full-text search over movie and series titles and descriptions"""
+    query = fts_query(request.args.get('q', ''))
+    page = max(request.args.get('page', 1, type=int), 1)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    if (page - 1) * limit > SQLITE_MAX_INT:
+        return jsonify({'error': 'Invalid page'}), 400
+    if not query:
+        return jsonify({'results': [], 'page': page, 'has_more': False, 'success': True})
+    
+    # Title hits weigh 10x description hits; lower bm25 is better
+    cursor = get_db().cursor()
+    cursor.execute('''
+        SELECT 'movie' AS kind, m.id, m.title, m.year, m.genre, m.rating, m.image_url,
+               bm25(movies_fts, 10.0, 1.0) AS score
+        FROM movies_fts JOIN movies m ON m.id = movies_fts.rowid
+        WHERE movies_fts MATCH ?
+        UNION ALL
+        SELECT 'series' AS kind, s.id, s.title, s.year, s.genre, s.rating, s.image_url,
+               bm25(series_fts, 10.0, 1.0) AS score
+        FROM series_fts JOIN series s ON s.id = series_fts.rowid
+        WHERE series_fts MATCH ?
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', (query, query, limit + 1, (page - 1) * limit))
+    rows = cursor.fetchall()
+    
+    results = []
+    for row in rows[:limit]:
+        item = dict(row)
+        del item['score']
+        if row['kind'] == 'movie':
+            item['url'] = url_for('watch_movie', movie_id=row['id'])
+        else:
+            item['url'] = url_for('series_detail', series_id=row['id'])
+        posters = poster_urls(row['image_url'])
+        item['thumb_url'] = posters['src']['grid'] if posters else row['image_url']
+        results.append(item)
+    
+    return jsonify({'results': results, 'page': page, 'has_more': len(rows) > limit, 'success': True})
 
 @app.route('/movie/<int:movie_id>')
 @login_required
@@ -628,15 +997,13 @@ def movie_detail(movie_id):
     cursor.execute('SELECT * FROM movies WHERE id = ?', (movie_id,))
     movie = cursor.fetchone()
     
-    # Increment view count
-    cursor.execute('UPDATE movies SET view_count = view_count + 1 WHERE id = ?', (movie_id,))
-    conn.commit()
-    conn.close()
-    
     if not movie:
         flash('Movie not found', 'error')
         return redirect(url_for('index'))
     
+    # Increment view count (buffered, flushed in the background)
+    view_counter.increment(movie_id)
+    
     return render_template('movie_detail.html', movie=movie, username=session.get('username'))
 
 @app.route('/series/<int:series_id>')
@@ -647,7 +1014,6 @@ def series_detail(series_id):
     cursor = conn.cursor()
     cursor.execute('SELECT * FROM series WHERE id = ?', (series_id,))
     series = cursor.fetchone()
-    conn.close()
     
     if not series:
         flash('Series not found', 'error')
@@ -655,6 +1021,17 @@ def series_detail(series_id):
     
     return render_template('series_detail.html', series=series, username=session.get('username'))
 
+def fetch_recommended(conn, table, item, index, limit=6):
+    """Nearest titles from the similarity index, or same-genre top rated before it is built"""
+    ids = index.neighbors(item['id'], limit)
+    if ids:
+        rows = {row['id']: row for row in conn.execute(
+            f'SELECT * FROM {table} WHERE id IN ({", ".join("?" for _ in ids)})', ids)}
+        return [rows[i] for i in ids if i in rows]
+    return conn.execute(f'''
+        SELECT * FROM {table} WHERE genre_mask & ? AND id != ? ORDER BY {sort_key('rating')} DESC, id DESC LIMIT ?
+    ''', (item['genre_mask'], item['id'], limit)).fetchall()
+
 @app.route('/watch/series/<int:series_id>')
 @login_required
 def watch_series(series_id):
@@ -664,16 +1041,13 @@ def watch_series(series_id):
     cursor.execute('SELECT * FROM series WHERE id = ?', (series_id,))
     series = cursor.fetchone()
     
-    # Get recommended series
-    cursor.execute('SELECT * FROM series WHERE genre = ? AND id != ? LIMIT 6', (series['genre'], series_id))
-    recommended = cursor.fetchall()
-    
-    conn.close()
-    
     if not series:
         flash('Series not found', 'error')
         return redirect(url_for('series_page'))
     
+    # Get recommended series
+    recommended = fetch_recommended(conn, 'series', series, similar_series)
+    
     return render_template('watch_series.html', series=series, recommended=recommended, username=session.get('username'))
 
 @app.route('/watch/<int:movie_id>')
@@ -685,20 +1059,16 @@ def watch_movie(movie_id):
     cursor.execute('SELECT * FROM movies WHERE id = ?', (movie_id,))
     movie = cursor.fetchone()
     
-    # Increment view count
-    cursor.execute('UPDATE movies SET view_count = view_count + 1 WHERE id = ?', (movie_id,))
-    conn.commit()
-    
-    # Get recommended movies (same genre)
-    cursor.execute('SELECT * FROM movies WHERE genre = ? AND id != ? LIMIT 6', (movie['genre'], movie_id))
-    recommended = cursor.fetchall()
-    
-    conn.close()
-    
     if not movie:
         flash('Movie not found', 'error')
         return redirect(url_for('index'))
     
+    # Increment view count (buffered, flushed in the background)
+    view_counter.increment(movie_id)
+    
+    # Get recommended movies
+    recommended = fetch_recommended(conn, 'movies', movie, similar_movies)
+    
     return render_template('watch.html', movie=movie, recommended=recommended, username=session.get('username'))
 
 @app.route('/chat', methods=['POST'])
@@ -714,22 +1084,19 @@ def chat():
         
         user_id = session.get('user_id')
         
-        # Save user message
-        CineBot.save_chat_message(user_id, user_message, is_bot=False)
+        # The widget only sends a stream_id while its /events stream is open (that stream may
+        # be held by another worker): answer at once and send the reply there as it is generated
+        stream_id = data.get('stream_id')
+        if stream_id is not None:
+            chat_replies.submit(stream_chat_reply, user_id, user_message, stream_id)
+            return jsonify({'streamed': True, 'success': True})
         
-        # Generate bot response
-        bot_response = CineBot.generate_response(user_message, user_id)
-        
-        # Save bot response
-        CineBot.save_chat_message(user_id, bot_response, is_bot=True)
-        
-        # Check watch time and add warning if needed
-        total_watch_time = CineBot.get_watch_time_today(user_id)
-        watch_warning = CineBot.get_watch_time_warning(total_watch_time)
+        bot_response, watch_warning = answer_chat(user_id, user_message)
         
         return jsonify({
             'response': bot_response,
             'watch_warning': watch_warning,
+            'streamed': False,
             'success': True
         })
     
@@ -737,28 +1104,74 @@ def chat():
         print(f"Chat error: {str(e)}")
         return jsonify({'error': 'Something went wrong'}), 500
 
+def answer_chat(user_id, user_message, on_piece=None):
+    """Generate and save CineBot's reply; return it with any watch-time warning"""
+    pieces = []
+    for piece in CineBot.iter_response(user_message, user_id):
+        pieces.append(piece)
+        if on_piece is not None:
+            on_piece(piece)
+    bot_response = ''.join(pieces)
+    
+    # Save both sides of the exchange in a single transaction
+    CineBot.save_chat_messages(user_id, [(user_message, False), (bot_response, True)])
+    
+    # Check watch time and add warning if needed
+    total_watch_time = CineBot.get_watch_time_today(user_id)
+    return bot_response, CineBot.get_watch_time_warning(total_watch_time)
+
+def stream_chat_reply(user_id, user_message, stream_id):
+    """Publish a reply piece by piece as chat_delta events, then the whole of it as chat_done"""
+    with app.app_context():
+        try:
+            bot_response, watch_warning = answer_chat(user_id, user_message, lambda piece: event_bus.publish(
+                user_id, 'chat_delta', {'id': stream_id, 'delta': piece}))
+        except Exception as e:
+            print(f"Chat error: {str(e)}")
+            event_bus.publish(user_id, 'chat_done', {'id': stream_id, 'error': 'Something went wrong'})
+            return
+        event_bus.publish(user_id, 'chat_done', {'id': stream_id, 'response': bot_response,
+                                                 'watch_warning': watch_warning})
+
 @app.route('/chat/history')
 @login_required
 def chat_history():
     """Get chat history"""
     try:
         user_id = session.get('user_id')
-        messages = CineBot.get_chat_history(user_id, limit=50)
+        before = request.args.get('before', type=int)
+        limit = max(1, min(request.args.get('limit', 50, type=int), 100))
+        if etag_matches(CineBot.get_chat_high_water_mark(user_id)):
+            return not_modified()
+        history, next_before = CineBot.get_chat_history(user_id, limit=limit, before=before)
         
-        history = []
-        for msg in messages:
-            history.append({
-                'message': msg['message'],
-                'is_bot': bool(msg['is_bot']),
-                'timestamp': msg['timestamp']
-            })
-        
-        return jsonify({'history': history, 'success': True})
+        return jsonify({
+            'history': history,
+            'next_before': next_before,
+            'has_more': next_before is not None,
+            'success': True
+        })
     
     except Exception as e:
         print(f"Chat history error: {str(e)}")
         return jsonify({'error': 'Failed to load history'}), 500
 
+def push_watch_warning(user_id, previous_minutes, total_minutes):
+    """Push a watch-time warning to the user's event streams when a threshold was just crossed"""
+    warning = CineBot.get_crossed_warning(previous_minutes, total_minutes)
+    if warning:
+        event_bus.publish(user_id, 'watch_warning', {'message': warning, 'total_minutes': total_minutes})
+
+@app.route('/events')
+@login_required
+def events():
+    """Server-sent event stream for the current user (chat replies, watch-time warnings)"""
+    user_id = session.get('user_id')
+    response = Response(stream_with_context(event_bus.stream(user_id)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/update_watch_time', methods=['POST'])
 @login_required
 def update_watch_time():
@@ -769,11 +1182,13 @@ def update_watch_time():
         minutes = data.get('minutes', 0)
         
         user_id = session.get('user_id')
+        previous_minutes = CineBot.get_watch_time_today(user_id)
         CineBot.update_watch_time(user_id, movie_id, minutes)
         
         # Get total watch time today
         total_minutes = CineBot.get_watch_time_today(user_id)
         warning = CineBot.get_watch_time_warning(total_minutes)
+        push_watch_warning(user_id, previous_minutes, total_minutes)
         
         return jsonify({
             'success': True,
@@ -785,5 +1200,42 @@ def update_watch_time():
         print(f"Watch time update error: {str(e)}")
         return jsonify({'error': 'Failed to update watch time'}), 500
 
+@app.route('/update_watch_time/batch', methods=['POST'])
+@login_required
+def update_watch_time_batch():
+    """Record several watch-time heartbeats at once"""
+    try:
+        # sendBeacon on page exit may not set a JSON content type
+        data = request.get_json(force=True, silent=True) or {}
+        heartbeats = []
+        for beat in data.get('heartbeats', []):
+            movie_id = int(beat.get('movie_id'))
+            minutes = int(beat.get('minutes', 0))
+            if minutes > 0:
+                heartbeats.append((movie_id, minutes))
+        
+        user_id = session.get('user_id')
+        previous_minutes = CineBot.get_watch_time_today(user_id)
+        if heartbeats:
+            CineBot.record_heartbeats(user_id, heartbeats)
+        
+        # Get total watch time today
+        total_minutes = CineBot.get_watch_time_today(user_id)
+        warning = CineBot.get_watch_time_warning(total_minutes)
+        push_watch_warning(user_id, previous_minutes, total_minutes)
+        
+        return jsonify({
+            'success': True,
+            'recorded': len(heartbeats),
+            'total_minutes': total_minutes,
+            'warning': warning
+        })
+    
+    except (TypeError, ValueError, AttributeError):
+        return jsonify({'error': 'Invalid heartbeats'}), 400
+    except Exception as e:
+        print(f"Watch time batch error: {str(e)}")
+        return jsonify({'error': 'Failed to update watch time'}), 500
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
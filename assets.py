@@ -0,0 +1,130 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip variants are always written
+    brotli = None
+
+from compression import accepted_encodings
+
+# Static files given a content-hashed name; text formats also get .gz/.br copies
+FINGERPRINT_EXTENSIONS = ('.css', '.js', '.svg', '.png', '.jpg', '.webp', '.ico')
+COMPRESS_EXTENSIONS = ('.css', '.js', '.svg')
+HASH_LENGTH = 12
+
+MANIFEST_NAME = 'manifest.json'
+
+# Content-Encoding -> file suffix, in order of preference when serving
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _hashed_name(filename: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def _write(path: str, data: bytes) -> None:
+    """Write next to the target and rename, so a running server never serves a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build_assets(static_dir: str, out_dir: str) -> Dict[str, int]:
+    """Copy static files under content-hashed names, precompress them and write the manifest
+
+    Files whose hashed name already exists are skipped, so a rebuild only
+    touches assets that changed; old hashed copies are left in place for
+    pages that were rendered before the rebuild.
+    """
+    manifest = {}
+    written = compressed = 0
+    for root, _, files in os.walk(static_dir):
+        for file in sorted(files):
+            if not file.endswith(FINGERPRINT_EXTENSIONS):
+                continue
+            filename = os.path.relpath(os.path.join(root, file), static_dir).replace(os.sep, '/')
+            with open(os.path.join(root, file), 'rb') as f:
+                data = f.read()
+            hashed = _hashed_name(filename, data)
+            manifest[filename] = hashed
+            target = os.path.join(out_dir, hashed)
+            if os.path.exists(target):
+                continue
+            _write(target, data)
+            written += 1
+            if not file.endswith(COMPRESS_EXTENSIONS):
+                continue
+            variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data, quality=11)
+            for suffix, body in variants.items():
+                # A variant that does not save bytes is never worth the decode
+                if len(body) < len(data):
+                    _write(target + suffix, body)
+                    compressed += 1
+
+    _write(os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return {'assets': len(manifest), 'written': written, 'compressed': compressed}
+
+
+class AssetManifest:
+    """Logical static filename -> fingerprinted name, reloaded when the manifest is rebuilt"""
+
+    def __init__(self, out_dir: str):
+        self.out_dir = out_dir
+        self.path = os.path.join(out_dir, MANIFEST_NAME)
+        # (file stamp, logical -> hashed, set of hashed names), swapped as one tuple
+        self._state = (None, {}, frozenset())
+        self._lock = threading.Lock()
+
+    def _current(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return {}, frozenset()
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        state = self._state
+        if stamp != state[0]:
+            with self._lock:
+                state = self._state
+                if stamp != state[0]:
+                    try:
+                        with open(self.path) as f:
+                            names = json.load(f)
+                    except (OSError, ValueError):
+                        names = {}
+                    state = self._state = (stamp, names, frozenset(names.values()))
+        return state[1], state[2]
+
+    def hashed(self, filename: str) -> Optional[str]:
+        """Fingerprinted name for a static filename, or None if it was not built"""
+        return self._current()[0].get(filename)
+
+    def resolve(self, hashed: str, accept_encoding: str = '') -> Optional[tuple]:
+        """(path, content encoding or None) of the best stored copy of a fingerprinted asset"""
+        if hashed not in self._current()[1]:
+            return None
+        path = os.path.join(self.out_dir, hashed)
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted and os.path.exists(path + suffix):
+                return path + suffix, encoding
+        return path, None
+
+
+if __name__ == '__main__':
+    import sys
+
+    static_dir = sys.argv[1] if len(sys.argv) > 1 else 'static'
+    out_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join('instance', 'assets')
+    report = build_assets(static_dir, out_dir)
+    print(f"{report['assets']} assets, {report['written']} written, {report['compressed']} precompressed"
+          f"{'' if brotli is not None else ' (brotli not installed, gzip only)'}")
@@ -0,0 +1,106 @@
+"""Benchmark: bulk catalog import from an NDJSON snapshot
+
+Generates a synthetic snapshot (movies and series in the export format),
+then loads it into a fresh, fully migrated database twice: row-at-a-time
+inserts with every index and trigger live, as a naive loader would, and
+catalog_snapshot.import_catalog with indexes and triggers deferred. With
+--similarity it also times the watch-page similarity build that
+`flask catalog import --similarity` (or the next init-db) runs afterwards;
+on a fresh catalog that is all-pairs scoring and dominates at large sizes.
+
+Run from the project root:
+
+    python benchmarks/bench_catalog_import.py [titles] [--similarity]
+"""
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import MOVIE_COLUMNS, SERIES_COLUMNS, movie_row, series_row
+from catalog_snapshot import import_catalog
+from genres import GENRE_NAMES, genre_mask
+from migrations import migrate
+from similarity import build_all as build_similarity
+
+WORDS = ('hero war love city night space family secret island road ghost heist storm king '
+         'detective robot dragon summer winter river').split()
+
+
+def snapshot(titles: int, seed: int = 0, first_id: int = 1) -> str:
+    rng = random.Random(seed)
+    genre_ids = list(GENRE_NAMES)
+    lines = []
+    for i in range(first_id, first_id + titles):
+        kind = 'series' if i % 5 == 0 else 'movie'
+        ids = rng.sample(genre_ids, rng.randint(1, 3))
+        record = {'kind': kind, 'id': i, 'title': f'{rng.choice(WORDS).title()} {i}',
+                  'year': rng.randint(1970, 2025), 'genre': GENRE_NAMES[ids[0]], 'genre_mask': genre_mask(ids),
+                  'rating': round(rng.uniform(1, 10), 1), 'image_url': f'https://image.tmdb.org/t/p/w500/p{i}.jpg',
+                  'description': ' '.join(rng.choices(WORDS, k=25)), 'video_url': '', 'trailer_url': ''}
+        if kind == 'movie':
+            record.update(is_trending=int(rng.random() < 0.05), view_count=rng.randint(0, 5000))
+        else:
+            record['seasons'] = rng.randint(1, 8)
+        lines.append(json.dumps(record))
+    return '\n'.join(lines) + '\n'
+
+
+def fresh_db(directory: str, name: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(os.path.join(directory, name))
+    conn.execute('PRAGMA journal_mode = WAL')
+    migrate(conn)
+    return conn
+
+
+def naive_import(conn, text: str) -> None:
+    movie_sql = f'INSERT INTO movies ({", ".join(MOVIE_COLUMNS)}) VALUES ({", ".join("?" for _ in MOVIE_COLUMNS)})'
+    series_sql = f'INSERT INTO series ({", ".join(SERIES_COLUMNS)}) VALUES ({", ".join("?" for _ in SERIES_COLUMNS)})'
+    with conn:
+        for line in io.StringIO(text):
+            record = json.loads(line)
+            if record['kind'] == 'movie':
+                conn.execute(movie_sql, movie_row(record))
+            else:
+                conn.execute(series_sql, series_row(record))
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--similarity']
+    titles = int(args[0]) if args else 100000
+    similarity = '--similarity' in sys.argv
+    text = snapshot(titles)
+    print(f"{titles} titles, {len(text) / 1e6:.1f} MB of NDJSON\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        conn = fresh_db(directory, 'naive.db')
+        started = time.perf_counter()
+        naive_import(conn, text)
+        naive = time.perf_counter() - started
+        conn.close()
+
+        conn = fresh_db(directory, 'bulk.db')
+        started = time.perf_counter()
+        import_catalog(conn, io.StringIO(text))
+        bulk = time.perf_counter() - started
+        links = conn.execute('SELECT COUNT(*) FROM movie_genres').fetchone()[0]
+        matches = conn.execute("SELECT COUNT(*) FROM movies_fts WHERE movies_fts MATCH 'hero'").fetchone()[0]
+        if similarity:
+            started = time.perf_counter()
+            build_similarity(conn, os.path.join(directory, 'similarity'))
+            neighbours = time.perf_counter() - started
+        conn.close()
+
+    print(f"{'loader':<28} {'seconds':>8} {'titles/s':>10}")
+    print(f"{'row by row, triggers live':<28} {naive:>8.2f} {titles / naive:>10,.0f}")
+    print(f"{'import_catalog (deferred)':<28} {bulk:>8.2f} {titles / bulk:>10,.0f}")
+    if similarity:
+        print(f"{'+ similarity index build':<28} {neighbours:>8.2f} {titles / neighbours:>10,.0f}")
+        print(f"{'import end to end':<28} {bulk + neighbours:>8.2f} {titles / (bulk + neighbours):>10,.0f}")
+    print(f"\n{links} movie genre links and {matches} full-text matches for 'hero' after the bulk load")
@@ -0,0 +1,61 @@
+"""Micro-benchmark: CineBot message analysis, keyword scans vs. the compiled matcher
+
+Run from the project root:
+
+    python benchmarks/bench_chat_matcher.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_matcher import INTENT_KEYWORDS, GENRE_KEYWORDS, MOOD_GENRE_MAP, default_matcher
+
+MESSAGES = [
+    "Hi there!",
+    "Recommend an action movie",
+    "I feel happy, what should I watch?",
+    "How much have I watched today?",
+    "Can you suggest a good science fiction film for tonight please",
+    "I'm feeling thoughtful and want to watch something with a mystery",
+    "What can you do?",
+    "this movie won an award for its war scenes",
+    "Show me some romantic comedies",
+    "I'm bored, anything tense?",
+]
+
+
+def legacy_analyze(message):
+    """The original CineBot logic: three lowercases and one substring scan per keyword"""
+    lowered = message.lower()
+    intent = 'general'
+    for name, words in INTENT_KEYWORDS:
+        if any(word in lowered for word in words):
+            intent = name
+            break
+
+    lowered = message.lower()
+    genre = next((g for keyword, g in GENRE_KEYWORDS.items() if keyword in lowered), None)
+
+    lowered = message.lower()
+    mood = next((m for m in MOOD_GENRE_MAP if m in lowered), None)
+    return intent, genre, mood
+
+
+def messages_per_second(analyze, rounds=5, number=2000):
+    best = min(timeit.repeat(lambda: [analyze(m) for m in MESSAGES], repeat=rounds, number=number))
+    return len(MESSAGES) * number / best
+
+
+if __name__ == '__main__':
+    before = messages_per_second(legacy_analyze)
+    after = messages_per_second(default_matcher.match)
+    print(f"{'keyword scans':<18} {before:>12,.0f} msg/s")
+    print(f"{'compiled matcher':<18} {after:>12,.0f} msg/s  ({after / before:.2f}x)")
+
+    print("\nWhere the two disagree:")
+    for message in MESSAGES:
+        old, new = legacy_analyze(message), default_matcher.match(message)
+        if old != new:
+            print(f"  {message!r}\n    before {old}\n    after  {new}")
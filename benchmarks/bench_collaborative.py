@@ -0,0 +1,52 @@
+"""Benchmark: collaborative-filtering training time against user count
+
+Trains the implicit ALS model in collaborative.py on synthetic watch
+histories (popularity-skewed titles, a handful per user) and reports how
+long factorizing and ranking take as the user base grows.
+
+Run from the project root:
+
+    python benchmarks/bench_collaborative.py [titles] [titles per user]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collaborative import Interactions, train, recommend
+
+USER_COUNTS = [100, 1000, 5000, 20000]
+
+
+def synthetic(users: int, titles: int, per_user: int, seed: int = 0) -> Interactions:
+    rng = np.random.default_rng(seed)
+    # Zipf-like popularity so a few titles are watched by most users
+    popularity = 1 / np.arange(1, titles + 1)
+    popularity /= popularity.sum()
+    user_ids = np.repeat(np.arange(users), per_user)
+    item_ids = rng.choice(titles, size=users * per_user, p=popularity)
+    minutes = rng.integers(1, 180, size=users * per_user)
+    # Collapse repeat views of the same title, as the SQL loader does
+    pairs, inverse = np.unique(np.stack([user_ids, item_ids], axis=1), axis=0, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=minutes)
+    return Interactions.from_triples(pairs[:, 0], pairs[:, 1], totals)
+
+
+if __name__ == '__main__':
+    titles = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    print(f"{titles} titles, ~{per_user} titles watched per user\n")
+    print(f"{'users':>8} {'pairs':>9} {'train s':>9} {'rank s':>8} {'users/s':>10}")
+    for users in USER_COUNTS:
+        interactions = synthetic(users, titles, per_user)
+        started = time.perf_counter()
+        user_factors, item_factors = train(interactions)
+        trained = time.perf_counter() - started
+        recommend(interactions, user_factors, item_factors)
+        ranked = time.perf_counter() - started - trained
+        print(f"{users:>8} {interactions.nnz:>9} {trained:>9.2f} {ranked:>8.2f} "
+              f"{users / (trained + ranked):>10,.0f}")
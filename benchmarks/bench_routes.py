@@ -0,0 +1,193 @@
+"""Benchmark: end-to-end route latency and throughput under concurrent users
+
+Each simulated user registers, logs in and then loops over the pages a
+viewer actually hits: the homepage, /movies, a /watch/<id> page, a CineBot
+/chat message and an /update_watch_time heartbeat. Per-route p50/p95/p99
+latency, error counts and overall throughput are reported.
+
+By default the app is booted in this process against benchmarks/fake_tmdb.py
+in a throwaway instance directory and served by a threaded WSGI server, so
+runs are reproducible and never touch TMDB. Clients and server then share
+one interpreter; for production-like numbers start the server separately
+(e.g. gunicorn pointed at the fake TMDB) and pass --url.
+
+Run from the project root:
+
+    python benchmarks/bench_routes.py [--users 16] [--duration 20] [--catalog 20000]
+    python benchmarks/bench_routes.py --url http://127.0.0.1:8000 --users 64
+"""
+import argparse
+import io
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import fake_tmdb  # noqa: E402
+
+ROUTES = ('/', '/movies', '/watch/<id>', '/chat', '/update_watch_time')
+CHAT_MESSAGES = ('recommend an action movie', 'I feel happy, what should I watch?', 'hi',
+                 'how much have I watched today', 'suggest a scary movie', 'help')
+
+
+def boot_app(args) -> str:
+    """Start fake TMDB and the app in this process; return the app's base URL"""
+    from werkzeug.serving import make_server
+
+    tmdb = fake_tmdb.serve(movies=args.tmdb_movies, series=args.tmdb_series, latency=args.tmdb_latency)
+    os.environ.update({
+        'CINEGO_INSTANCE_PATH': tempfile.mkdtemp(prefix='cinego-bench-'),
+        'CINEGO_TMDB_BASE_URL': f'http://127.0.0.1:{tmdb.server_port}/3',
+        'CINEGO_TMDB_IMAGE_BASE_URL': f'http://127.0.0.1:{tmdb.server_port}/t/p/w500',
+        'CINEGO_INIT_ON_IMPORT': '0',
+        'CINEGO_CATALOG_REFRESH_INTERVAL': '0',
+        'CINEGO_CHAT_ARCHIVE_INTERVAL': '0',
+        'CINEGO_RECOMMENDER_TRAIN_INTERVAL': '0',
+    })
+    import app as cinego
+
+    started = time.perf_counter()
+    cinego.initialize()
+    print(f"Seeded from fake TMDB in {time.perf_counter() - started:.2f}s "
+          f"({fake_tmdb_requests(tmdb)} TMDB requests)")
+    if args.catalog:
+        from bench_catalog_import import snapshot
+        from catalog_snapshot import import_catalog
+
+        conn = cinego.connect_db()
+        try:
+            # Ids past anything the fake TMDB hands out, so the seeded titles are kept
+            text = snapshot(args.catalog, first_id=max(args.tmdb_movies, args.tmdb_series) + 1)
+            counts = import_catalog(conn, io.StringIO(text))
+        finally:
+            conn.close()
+        cinego.rebuild_similarity()
+        print(f"Imported {counts['movies']} movies and {counts['series']} series in {counts['seconds']}s")
+
+    # One access log line per request would dominate the run
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, cinego.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def fake_tmdb_requests(server) -> int:
+    return server.RequestHandlerClass.stats['requests']
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class User:
+    """One logged-in browser session replaying the route loop"""
+
+    def __init__(self, base_url: str, number: int, seed: int):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.rng = random.Random(seed)
+        self.name = f'bench{seed}_{number}'
+
+    def login(self) -> None:
+        form = {'username': self.name, 'email': f'{self.name}@bench.local', 'password': 'bench-password',
+                'confirm_password': 'bench-password'}
+        self.session.post(f'{self.base_url}/register', data=form)
+        response = self.session.post(f'{self.base_url}/login',
+                                     data={'username': self.name, 'password': 'bench-password'})
+        response.raise_for_status()
+
+    def movie_ids(self) -> list:
+        response = self.session.get(f'{self.base_url}/movies/page', params={'limit': 100, 'order': 'views'})
+        response.raise_for_status()
+        return [item['id'] for item in response.json()['items']]
+
+    def request(self, route: str, movie_ids: list):
+        if route == '/watch/<id>':
+            return self.session.get(f'{self.base_url}/watch/{self.rng.choice(movie_ids)}')
+        if route == '/chat':
+            return self.session.post(f'{self.base_url}/chat', json={'message': self.rng.choice(CHAT_MESSAGES)})
+        if route == '/update_watch_time':
+            return self.session.post(f'{self.base_url}/update_watch_time',
+                                     json={'movie_id': self.rng.choice(movie_ids), 'minutes': 1})
+        return self.session.get(f'{self.base_url}{route}')
+
+
+def run_user(user: User, movie_ids: list, deadline: float, think: float, results: dict) -> None:
+    while time.perf_counter() < deadline:
+        for route in ROUTES:
+            started = time.perf_counter()
+            try:
+                response = user.request(route, movie_ids)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            results[route].append((elapsed, ok))
+            if think:
+                time.sleep(user.rng.uniform(0, 2 * think))
+
+
+def report(results: dict, wall: float) -> None:
+    print(f"\n{'route':<20} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    everything = []
+    for route in ROUTES:
+        samples = results[route]
+        latencies = sorted(elapsed for elapsed, _ in samples)
+        everything.extend(latencies)
+        errors = sum(1 for _, ok in samples if not ok)
+        print(f"{route:<20} {len(samples):>9} {errors:>7} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 95) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f} "
+              f"{len(samples) / wall:>8.1f}")
+    everything.sort()
+    print(f"{'all':<20} {len(everything):>9} {'':>7} {percentile(everything, 50) * 1000:>8.1f} "
+          f"{percentile(everything, 95) * 1000:>8.1f} {percentile(everything, 99) * 1000:>8.1f} "
+          f"{len(everything) / wall:>8.1f}")
+    if everything:
+        print(f"\nmean {statistics.fmean(everything) * 1000:.1f} ms over {wall:.1f}s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='End-to-end CineGo route benchmark')
+    parser.add_argument('--url', help='benchmark a running server instead of booting one in-process')
+    parser.add_argument('--users', type=int, default=16, help='concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of measured load')
+    parser.add_argument('--warmup', type=float, default=3, help='seconds of unmeasured load first')
+    parser.add_argument('--think', type=float, default=0, help='mean pause between requests per user')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--catalog', type=int, default=0, help='extra synthetic titles imported (in-process only)')
+    parser.add_argument('--tmdb-movies', type=int, default=2000)
+    parser.add_argument('--tmdb-series', type=int, default=400)
+    parser.add_argument('--tmdb-latency', type=float, default=0.0, help='seconds added to each fake TMDB call')
+    args = parser.parse_args()
+
+    base_url = args.url.rstrip('/') if args.url else boot_app(args)
+    users = [User(base_url, n, args.seed) for n in range(args.users)]
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(User.login, users))
+    movie_ids = users[0].movie_ids()
+    print(f"{args.users} users against {base_url}, {len(movie_ids)} watchable titles in rotation")
+
+    # The warmup pass fills caches and connection pools; only the second pass is reported
+    for seconds in (args.warmup, args.duration):
+        results = {route: [] for route in ROUTES}
+        started = time.perf_counter()
+        deadline = started + seconds
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            for user in users:
+                pool.submit(run_user, user, movie_ids, deadline, args.think, results)
+        wall = time.perf_counter() - started
+    report(results, wall)
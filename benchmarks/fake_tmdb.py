@@ -0,0 +1,209 @@
+"""Local stand-in for the TMDB endpoints CineGo uses, for offline runs and load tests
+
+Serves deterministic synthetic payloads for any catalog size without
+storing it: every title is derived from its id, and each list endpoint
+walks the ids in its own fixed order. Optional per-request latency mimics
+the real API. Covered endpoints:
+
+    /3/trending/movie/week, /3/movie/top_rated, /3/movie/now_playing,
+    /3/movie/upcoming, /3/discover/movie?with_genres=, /3/tv/popular,
+    /3/movie/<id>/videos, /3/tv/<id>/videos, /t/p/<size>/<name>.jpg
+
+Run it and point CineGo at it:
+
+    python benchmarks/fake_tmdb.py --movies 5000 --series 1000 --latency 0.05 --port 8765
+    CINEGO_TMDB_BASE_URL=http://127.0.0.1:8765/3 \\
+    CINEGO_TMDB_IMAGE_BASE_URL=http://127.0.0.1:8765/t/p/w500 python app.py
+"""
+import argparse
+import io
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from PIL import Image
+except ImportError:  # posters are answered with 404 without Pillow; CineGo shows its placeholder
+    Image = None
+
+PAGE_SIZE = 20
+MOVIE_GENRES = (28, 12, 16, 35, 80, 99, 18, 10751, 14, 36, 27, 10402, 9648, 10749, 878, 53, 10752, 37)
+TV_GENRES = (10759, 16, 35, 80, 99, 18, 10751, 10762, 9648, 10765, 10768, 37)
+WORDS = ('hero war love city night space family secret island road ghost heist storm king detective '
+         'robot dragon summer winter river empire shadow signal voyage echo harbor frontier').split()
+
+VIDEOS_RE = re.compile(r'^/3/(movie|tv)/(\d+)/videos$')
+IMAGE_RE = re.compile(r'^/t/p/w(\d+)/[pq](\d+)\.jpg$')
+
+
+def _stride(n: int, seed: int) -> int:
+    """A step coprime with n, so (k * step) % n visits every id exactly once"""
+    step = seed % max(n, 1) or 1
+    while math.gcd(step, n) != 1:
+        step += 1
+    return step
+
+
+class Catalog:
+    """Synthetic movies 1..movies and series 1..series, each a pure function of its id"""
+
+    def __init__(self, movies: int, series: int):
+        self.movies = movies
+        self.series = series
+
+    @staticmethod
+    def _rng(kind: str, item_id: int) -> random.Random:
+        return random.Random(zlib.crc32(f'{kind}:{item_id}'.encode()))
+
+    def movie(self, movie_id: int) -> dict:
+        rng = self._rng('movie', movie_id)
+        return {
+            'id': movie_id,
+            'title': f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {movie_id}',
+            'release_date': f'{rng.randint(1970, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+            'genre_ids': rng.sample(MOVIE_GENRES, rng.randint(1, 3)),
+            'vote_average': round(rng.uniform(3, 9.5), 1),
+            # Lower ids are more popular; roughly the first few hundred count as trending
+            'popularity': round(3000 / (math.sqrt(movie_id) + 1), 3),
+            'poster_path': f'/p{movie_id}.jpg',
+            'overview': ' '.join(rng.choices(WORDS, k=rng.randint(15, 40))).capitalize() + '.',
+        }
+
+    def show(self, series_id: int) -> dict:
+        rng = self._rng('tv', series_id)
+        return {
+            'id': series_id,
+            'name': f'The {rng.choice(WORDS).title()} {series_id}',
+            'first_air_date': f'{rng.randint(1990, 2025)}-{rng.randint(1, 12):02d}-01',
+            'genre_ids': rng.sample(TV_GENRES, rng.randint(1, 2)),
+            'vote_average': round(rng.uniform(4, 9.5), 1),
+            'popularity': round(2000 / (math.sqrt(series_id) + 1), 3),
+            'poster_path': f'/q{series_id}.jpg',
+            'overview': ' '.join(rng.choices(WORDS, k=rng.randint(15, 40))).capitalize() + '.',
+        }
+
+    def movie_ids(self, listing: str, page: int, genre: int = 0) -> list:
+        """Ids on one page of a movie list; each list walks the catalog in its own order"""
+        n = self.movies
+        start = (page - 1) * PAGE_SIZE
+        if listing == 'discover':
+            # Every title whose generated genres include the requested one, in id order
+            ids, skipped, movie_id = [], 0, 0
+            while len(ids) < PAGE_SIZE and movie_id < n:
+                movie_id += 1
+                if genre in self.movie(movie_id)['genre_ids']:
+                    if skipped < start:
+                        skipped += 1
+                    else:
+                        ids.append(movie_id)
+            return ids
+        step = {'trending': 1, 'top_rated': _stride(n, 7919), 'now_playing': _stride(n, 104729),
+                'upcoming': _stride(n, 15485863)}[listing]
+        return [(k * step) % n + 1 for k in range(start, min(start + PAGE_SIZE, n))]
+
+    def series_ids(self, page: int) -> list:
+        start = (page - 1) * PAGE_SIZE
+        return list(range(start + 1, min(start + PAGE_SIZE, self.series) + 1))
+
+
+MOVIE_LISTS = {
+    '/3/trending/movie/week': 'trending',
+    '/3/movie/top_rated': 'top_rated',
+    '/3/movie/now_playing': 'now_playing',
+    '/3/movie/upcoming': 'upcoming',
+    '/3/discover/movie': 'discover',
+}
+
+
+def make_handler(catalog: Catalog, latency: float = 0.0, jitter: float = 0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        stats = {'requests': 0}
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json'):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, data):
+            self._send(200, json.dumps(data).encode())
+
+        def _page(self, results, page: int, total: int):
+            self._json({'page': page, 'results': results, 'total_results': total,
+                        'total_pages': math.ceil(total / PAGE_SIZE)})
+
+        def do_GET(self):
+            Handler.stats['requests'] += 1
+            if latency or jitter:
+                time.sleep(latency + random.uniform(0, jitter))
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            page = max(1, int(query.get('page', ['1'])[0]))
+
+            listing = MOVIE_LISTS.get(url.path)
+            if listing:
+                genre = int(query.get('with_genres', ['0'])[0].split(',')[0] or 0)
+                ids = catalog.movie_ids(listing, page, genre)
+                return self._page([catalog.movie(i) for i in ids], page, catalog.movies)
+            if url.path == '/3/tv/popular':
+                return self._page([catalog.show(i) for i in catalog.series_ids(page)], page, catalog.series)
+
+            match = VIDEOS_RE.match(url.path)
+            if match:
+                kind, item_id = match.group(1), int(match.group(2))
+                if not 1 <= item_id <= (catalog.movies if kind == 'movie' else catalog.series):
+                    return self._send(404, b'{"success": false}')
+                return self._json({'id': item_id, 'results': [
+                    {'site': 'YouTube', 'type': 'Trailer', 'key': f'fake{kind}{item_id}'}]})
+
+            match = IMAGE_RE.match(url.path)
+            if match and Image is not None:
+                width = min(int(match.group(1)), 780)
+                shade = int(match.group(2)) * 37 % 200
+                out = io.BytesIO()
+                Image.new('RGB', (width, width * 3 // 2), (30 + shade // 4, 20, 40 + shade // 2)).save(out, 'JPEG')
+                return self._send(200, out.getvalue(), 'image/jpeg')
+
+            self._send(404, b'{"success": false, "status_message": "Not found"}')
+
+    return Handler
+
+
+def serve(host: str = '127.0.0.1', port: int = 0, movies: int = 1000, series: int = 200,
+          latency: float = 0.0, jitter: float = 0.0) -> ThreadingHTTPServer:
+    """Start the fake API on a daemon thread; server.server_port is the bound port"""
+    server = ThreadingHTTPServer((host, port), make_handler(Catalog(movies, series), latency, jitter))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-tmdb', daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--movies', type=int, default=1000)
+    parser.add_argument('--series', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='up to this many extra random seconds')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(Catalog(args.movies, args.series), args.latency, args.jitter))
+    server.daemon_threads = True
+    print(f"Fake TMDB with {args.movies} movies and {args.series} series on http://{args.host}:{server.server_port}/3")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
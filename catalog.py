@@ -0,0 +1,266 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Callable
+
+from tmdb_client import TMDBClient, TMDBError
+
+# (fetch method, page) pairs pulled when seeding the catalog
+MOVIE_LIST_JOBS = (
+    [(TMDBClient.fetch_trending_movies, page) for page in range(1, 4)] +
+    [(TMDBClient.fetch_top_rated_movies, page) for page in range(1, 3)] +
+    [(TMDBClient.fetch_now_playing_movies, page) for page in range(1, 3)] +
+    [(TMDBClient.fetch_action_movies, 1), (TMDBClient.fetch_comedy_movies, 1)]
+)
+
+SERIES_LIST_JOBS = [(TMDBClient.fetch_popular_series, page) for page in range(1, 4)]
+
+# Only the most popular movies get a trailer lookup to keep startup responsive
+TRAILER_MOVIE_LIMIT = 20
+
+MOVIE_COLUMNS = ('id', 'title', 'year', 'genre', 'rating', 'image_url', 'description',
+                 'is_trending', 'view_count', 'video_url', 'trailer_url', 'genre_mask')
+
+SERIES_COLUMNS = ('id', 'title', 'year', 'genre', 'rating', 'image_url', 'description',
+                  'seasons', 'video_url', 'trailer_url', 'genre_mask')
+
+
+def _run_job(job):
+    fetch, page = job
+    try:
+        return fetch(page=page)
+    except TMDBError as e:
+        print(f"Skipping {fetch.__name__} page {page}: {e}")
+        return []
+
+
+def _fetch_videos(fetch, item_id):
+    try:
+        return fetch(item_id)
+    except TMDBError as e:
+        print(f"Skipping {fetch.__name__} for {item_id}: {e}")
+        return None
+
+
+def fetch_catalog(concurrency: int = 8) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Fetch movie and series lists plus trailers from TMDB over a bounded thread pool"""
+    concurrency = max(1, int(concurrency))
+    TMDBClient.configure_pool(concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        print(f"Fetching {len(MOVIE_LIST_JOBS)} movie and {len(SERIES_LIST_JOBS)} series pages...")
+        movie_pages = pool.map(_run_job, MOVIE_LIST_JOBS)
+        series_pages = pool.map(_run_job, SERIES_LIST_JOBS)
+
+        # Later lists win on duplicate ids, matching the old sequential order
+        all_movies = {}
+        for page in movie_pages:
+            for m in page:
+                all_movies[m['id']] = m
+
+        all_series = [s for page in series_pages for s in page]
+
+        # Sort by popularity to find the "best" ones to get trailers for
+        movies = sorted(all_movies.values(), key=lambda x: x.get('view_count', 0), reverse=True)
+        top_movies = movies[:TRAILER_MOVIE_LIMIT]
+
+        print(f"Fetching trailers for {len(top_movies)} movies and {len(all_series)} series...")
+        movie_videos = pool.map(_fetch_videos, [TMDBClient.fetch_movie_videos] * len(top_movies),
+                                [m['id'] for m in top_movies])
+        series_videos = pool.map(_fetch_videos, [TMDBClient.fetch_series_videos] * len(all_series),
+                                 [s['id'] for s in all_series])
+
+        for movie_data, video_data in zip(top_movies, movie_videos):
+            if video_data:
+                movie_data['trailer_url'] = video_data['url']
+
+        for series_data, video_data in zip(all_series, series_videos):
+            series_data['video_url'] = ''
+            series_data['trailer_url'] = video_data['url'] if video_data else ''
+
+    return movies, all_series
+
+
+def movie_row(m: Dict[str, Any]) -> tuple:
+    """Map a processed TMDB movie onto MOVIE_COLUMNS"""
+    return (
+        m['id'],
+        m['title'],
+        m['year'],
+        m['genre'],
+        m['rating'],
+        m['image_url'],
+        m['description'],
+        m.get('is_trending', 0),
+        m['view_count'],
+        m.get('video_url', ''),
+        m.get('trailer_url', ''),
+        m.get('genre_mask', 0)
+    )
+
+
+def series_row(s: Dict[str, Any]) -> tuple:
+    """Map a processed TMDB series onto SERIES_COLUMNS"""
+    return (
+        s['id'],
+        s['title'],
+        s['year'],
+        s['genre'],
+        s['rating'],
+        s['image_url'],
+        s['description'],
+        s['seasons'],
+        s.get('video_url', ''),
+        s.get('trailer_url', ''),
+        s.get('genre_mask', 0)
+    )
+
+
+def get_catalog_version(conn) -> int:
+    """Return the catalog version; it changes whenever movies or series are written"""
+    row = conn.execute("SELECT value FROM catalog_meta WHERE key = 'version'").fetchone()
+    return row[0] if row else 0
+
+
+def bump_catalog_version(conn) -> None:
+    """Invalidate everything cached from the catalog (runs in the caller's transaction)"""
+    conn.execute("UPDATE catalog_meta SET value = value + 1 WHERE key = 'version'")
+
+
+def insert_catalog(conn, movies: List[Dict[str, Any]], series: List[Dict[str, Any]]) -> None:
+    """Insert movies and series with one executemany per table in a single transaction"""
+    movie_sql = 'INSERT OR IGNORE INTO movies ({}) VALUES ({})'.format(
+        ', '.join(MOVIE_COLUMNS), ', '.join('?' for _ in MOVIE_COLUMNS))
+    series_sql = 'INSERT OR IGNORE INTO series ({}) VALUES ({})'.format(
+        ', '.join(SERIES_COLUMNS), ', '.join('?' for _ in SERIES_COLUMNS))
+
+    with conn:
+        conn.executemany(movie_sql, [movie_row(m) for m in movies])
+        conn.executemany(series_sql, [series_row(s) for s in series])
+        bump_catalog_version(conn)
+
+
+def _merge_movie(new: tuple, old: tuple) -> tuple:
+    """Merge a fresh TMDB movie row over the stored one, keeping local view counts and trailers"""
+    merged = list(new)
+    view_idx = MOVIE_COLUMNS.index('view_count')
+    merged[view_idx] = max(new[view_idx], old[view_idx] or 0)
+    for column in ('video_url', 'trailer_url'):
+        idx = MOVIE_COLUMNS.index(column)
+        if not new[idx]:
+            merged[idx] = old[idx]
+    return tuple(merged)
+
+
+def _merge_series(new: tuple, old: tuple) -> tuple:
+    """Merge a fresh TMDB series row over the stored one, keeping known trailers"""
+    merged = list(new)
+    for column in ('video_url', 'trailer_url'):
+        idx = SERIES_COLUMNS.index(column)
+        if not new[idx]:
+            merged[idx] = old[idx]
+    return tuple(merged)
+
+
+def _diff_rows(conn, table: str, columns: tuple, rows: List[tuple], merge) -> Tuple[list, list, int]:
+    """Split fresh rows into (inserts, updates, skipped count) against the stored table"""
+    existing = {row[0]: tuple(row) for row in conn.execute(f'SELECT {", ".join(columns)} FROM {table}')}
+    inserts, updates, skipped, seen = [], [], 0, set()
+    for row in rows:
+        if row[0] in seen:
+            continue
+        seen.add(row[0])
+        old = existing.get(row[0])
+        if old is None:
+            inserts.append(row)
+            continue
+        merged = merge(row, old)
+        if merged == old:
+            skipped += 1
+        else:
+            updates.append(merged)
+    return inserts, updates, skipped
+
+
+def upsert_sql(table: str, columns: tuple, keep_higher: tuple = ()) -> str:
+    """INSERT ... ON CONFLICT statement; columns in keep_higher never move backwards on conflict"""
+    assignments = ', '.join(
+        f'{c} = MAX(COALESCE({table}.{c}, 0), excluded.{c})' if c in keep_higher else f'{c} = excluded.{c}'
+        for c in columns if c != 'id')
+    return 'INSERT INTO {} ({}) VALUES ({}) ON CONFLICT(id) DO UPDATE SET {}'.format(
+        table, ', '.join(columns), ', '.join('?' for _ in columns), assignments)
+
+
+def _write_batches(conn, sql: str, rows: List[tuple], batch_size: int) -> None:
+    """Write rows in short transactions so readers are never held up for long"""
+    for start in range(0, len(rows), batch_size):
+        with conn:
+            conn.executemany(sql, rows[start:start + batch_size])
+            bump_catalog_version(conn)
+
+
+def refresh_catalog(conn, concurrency: int = 8, batch_size: int = 50) -> Dict[str, Any]:
+    """Re-pull TMDB lists and upsert only the movies and series that changed"""
+    started = time.monotonic()
+    movies, series = fetch_catalog(concurrency)
+
+    report = {}
+    for table, columns, rows, merge in (
+        ('movies', MOVIE_COLUMNS, [movie_row(m) for m in movies], _merge_movie),
+        ('series', SERIES_COLUMNS, [series_row(s) for s in series], _merge_series),
+    ):
+        inserts, updates, skipped = _diff_rows(conn, table, columns, rows, merge)
+        # View counts flushed by ViewCounter after _diff_rows read them must not be overwritten
+        sql = upsert_sql(table, columns, keep_higher=('view_count',))
+        _write_batches(conn, sql, inserts + updates, batch_size)
+        report[table] = {'added': len(inserts), 'updated': len(updates), 'skipped': skipped}
+
+    report['seconds'] = round(time.monotonic() - started, 2)
+    return report
+
+
+class CatalogRefresher:
+    """Background thread that refreshes the catalog from TMDB on a fixed interval"""
+
+    def __init__(self, connect, interval: float, concurrency: int = 8, batch_size: int = 50,
+                 after_refresh: Optional[Callable[[], None]] = None):
+        self.connect = connect
+        self.interval = interval
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        # Called after every refresh, e.g. to rebuild indexes derived from the catalog
+        self.after_refresh = after_refresh
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='catalog-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> Dict[str, Any]:
+        """Run a single refresh and remember its report"""
+        conn = self.connect()
+        try:
+            self.last_report = refresh_catalog(conn, self.concurrency, self.batch_size)
+        finally:
+            conn.close()
+        m, s = self.last_report['movies'], self.last_report['series']
+        print(f"Catalog refresh: movies +{m['added']} ~{m['updated']} ={m['skipped']}, "
+              f"series +{s['added']} ~{s['updated']} ={s['skipped']} "
+              f"in {self.last_report['seconds']}s")
+        if self.after_refresh is not None:
+            self.after_refresh()
+        return self.last_report
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Catalog refresh error: {str(e)}")
@@ -0,0 +1,171 @@
+import gzip
+import io
+import json
+import sys
+import time
+from typing import Any, Dict, IO, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # zstd snapshots are optional; gzip and plain NDJSON always work
+    zstandard = None
+
+from catalog import MOVIE_COLUMNS, SERIES_COLUMNS, movie_row, series_row, bump_catalog_version, upsert_sql
+from tmdb_client import TMDBClient
+
+# Rows handed to each executemany call during import
+CHUNK_SIZE = 5000
+
+# kind -> (table, columns, dict -> row, raw TMDB result -> processed dict)
+KINDS = {
+    'movie': ('movies', MOVIE_COLUMNS, movie_row, TMDBClient._process_movie),
+    'series': ('series', SERIES_COLUMNS, series_row, TMDBClient._process_series),
+}
+
+# Tables whose rows are derived from movies/series by triggers; rebuilt once after a bulk load
+LINK_TABLES = {'movies': ('movie_genres', 'movie_id'), 'series': ('series_genres', 'series_id')}
+
+
+def compression_for(path: str, compression: Optional[str] = None) -> str:
+    """'zstd', 'gzip' or 'none', from the explicit choice or the file extension"""
+    if compression:
+        return compression
+    if path.endswith(('.zst', '.zstd')):
+        return 'zstd'
+    if path.endswith('.gz'):
+        return 'gzip'
+    return 'none'
+
+
+def _require_zstd() -> None:
+    if zstandard is None:
+        raise RuntimeError('zstd snapshots need the zstandard package (pip install zstandard)')
+
+
+def open_snapshot(path: str, mode: str, compression: Optional[str] = None) -> IO[str]:
+    """Text stream over a snapshot file ('-' for stdin/stdout), compressed as requested"""
+    compression = compression_for(path, compression)
+    if compression == 'zstd':
+        # Before opening, so a failed export leaves no empty file behind
+        _require_zstd()
+    if path == '-':
+        raw = sys.stdin.buffer if mode == 'r' else sys.stdout.buffer
+    else:
+        raw = open(path, mode + 'b')
+    if compression == 'gzip':
+        raw = gzip.GzipFile(fileobj=raw, mode=mode, compresslevel=6)
+    elif compression == 'zstd':
+        if mode == 'r':
+            raw = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            raw = zstandard.ZstdCompressor(level=6).stream_writer(raw, closefd=True)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='\n')
+
+
+def export_catalog(conn, out: IO[str]) -> Dict[str, int]:
+    """Write every movie and series as one NDJSON object per line
+
+    Each object has the fields TMDBClient._process_movie/_process_series
+    produce (plus local view counts and trailers) and a "kind" key.
+    """
+    counts = {}
+    for kind, (table, columns, _, _) in KINDS.items():
+        counts[table] = 0
+        cursor = conn.execute(f'SELECT {", ".join(columns)} FROM {table} ORDER BY id')
+        while True:
+            rows = cursor.fetchmany(CHUNK_SIZE)
+            if not rows:
+                break
+            out.writelines(json.dumps({'kind': kind, **dict(zip(columns, row))}, ensure_ascii=False) + '\n'
+                           for row in rows)
+            counts[table] += len(rows)
+    return counts
+
+
+def _row(record: Dict[str, Any]) -> tuple:
+    _, _, to_row, process = KINDS[record['kind']]
+    # Raw TMDB list results (genre_ids, poster_path, ...) go through the client's own mapping
+    if 'genre_ids' in record and 'genre_mask' not in record:
+        record = {**record, **process(record)}
+    return to_row(record)
+
+
+def _records(lines: Iterator[str]) -> Iterator[Tuple[str, tuple]]:
+    """(kind, table row) per NDJSON line; ValueError names the first bad line"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f'line {number}: invalid JSON ({e})') from None
+        kind = record.get('kind') if isinstance(record, dict) else None
+        if kind not in KINDS:
+            raise ValueError(f'line {number}: unknown kind {kind!r}')
+        try:
+            row = _row(record)
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f'line {number}: bad {kind} record ({e!r})') from None
+        yield kind, row
+
+
+def _deferred_schema(conn, tables) -> list:
+    """(type, name, sql) of the explicit indexes and triggers on tables, triggers last"""
+    placeholders = ', '.join('?' for _ in tables)
+    return conn.execute(f'''
+        SELECT type, name, sql FROM sqlite_master
+        WHERE tbl_name IN ({placeholders}) AND type IN ('index', 'trigger') AND sql IS NOT NULL
+        ORDER BY type = 'trigger', name
+    ''', tuple(tables)).fetchall()
+
+
+def import_catalog(conn, lines: Iterator[str], chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    """Upsert NDJSON catalog records in one transaction; return counts per table
+
+    The secondary indexes and triggers on movies and series are dropped for
+    the load and recreated afterwards, so the full-text and genre link
+    tables are rebuilt once instead of row by row. Existing titles with the
+    same id are overwritten; nothing is deleted.
+    """
+    started = time.monotonic()
+    counts = {table: 0 for table, *_ in KINDS.values()}
+    sql = {kind: upsert_sql(table, columns) for kind, (table, columns, _, _) in KINDS.items()}
+    pending = {kind: [] for kind in KINDS}
+
+    with conn:
+        # DDL does not open a transaction implicitly; without this the DROPs would commit at once
+        conn.execute('BEGIN IMMEDIATE')
+        schema = _deferred_schema(conn, tuple(counts))
+        for object_type, name, _ in schema:
+            conn.execute(f'DROP {object_type.upper()} {name}')
+
+        for kind, row in _records(lines):
+            batch = pending[kind]
+            batch.append(row)
+            if len(batch) >= chunk_size:
+                conn.executemany(sql[kind], batch)
+                counts[KINDS[kind][0]] += len(batch)
+                batch.clear()
+        for kind, batch in pending.items():
+            conn.executemany(sql[kind], batch)
+            counts[KINDS[kind][0]] += len(batch)
+
+        # Recreate indexes (bulk-built from sorted data), then the derived tables, then triggers
+        for object_type, _, statement in schema:
+            if object_type == 'index':
+                conn.execute(statement)
+        for table, (link_table, key) in LINK_TABLES.items():
+            conn.execute(f'DELETE FROM {link_table}')
+            conn.execute(f'''
+                INSERT INTO {link_table} ({key}, genre_id)
+                SELECT t.id, g.id FROM {table} t JOIN genres g ON t.genre_mask & (1 << g.bit)
+            ''')
+            conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+        for object_type, _, statement in schema:
+            if object_type == 'trigger':
+                conn.execute(statement)
+        bump_catalog_version(conn)
+
+    counts['seconds'] = round(time.monotonic() - started, 2)
+    return counts
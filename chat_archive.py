@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+
+def _pack(rows) -> bytes:
+    return zlib.compress(json.dumps([list(row) for row in rows]).encode())
+
+
+def _unpack(payload: bytes) -> List[list]:
+    return json.loads(zlib.decompress(payload))
+
+
+def archive_chat_history(conn, keep_messages: int, keep_days: int, batch_size: int = 500) -> Dict[str, int]:
+    """Move chat rows outside each user's hot window into compressed archive chunks
+
+    A row stays hot while it is among the user's last keep_messages
+    messages or younger than keep_days. Everything else is copied into
+    chat_history_archive in chunks of batch_size rows (one transaction per
+    chunk) and deleted from chat_history.
+    """
+    cutoff = (datetime.utcnow() - timedelta(days=keep_days)).strftime('%Y-%m-%d %H:%M:%S')
+    archived = chunks = 0
+
+    users = conn.execute('''
+        SELECT user_id FROM chat_history GROUP BY user_id HAVING COUNT(*) > ?
+    ''', (keep_messages,)).fetchall()
+
+    for (user_id,) in users:
+        # Id of the oldest message inside the last-N window
+        boundary = conn.execute('''
+            SELECT id FROM chat_history WHERE user_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?
+        ''', (user_id, max(keep_messages - 1, 0))).fetchone()
+        if boundary is None:
+            continue
+
+        while True:
+            rows = conn.execute('''
+                SELECT id, message, is_bot, timestamp FROM chat_history
+                WHERE user_id = ? AND id < ? AND timestamp < ?
+                ORDER BY id LIMIT ?
+            ''', (user_id, boundary[0], cutoff, batch_size)).fetchall()
+            if not rows:
+                break
+
+            with conn:
+                conn.execute('''
+                    INSERT INTO chat_history_archive
+                        (user_id, first_id, last_id, first_timestamp, last_timestamp, message_count, payload)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, rows[0][0], rows[-1][0], rows[0][3], rows[-1][3], len(rows), _pack(rows)))
+                conn.executemany('DELETE FROM chat_history WHERE id = ?', [(row[0],) for row in rows])
+            archived += len(rows)
+            chunks += 1
+
+    return {'archived': archived, 'chunks': chunks}
+
+
+def load_history_page(conn, user_id: int, before: Optional[int], limit: int) -> Tuple[List[Dict], Optional[int]]:
+    """Return up to limit messages older than id `before` (newest first) and the next cursor
+
+    Hot and archived rows are merged by id; archive chunks are only
+    decompressed while they can still contribute to the page.
+    """
+    params = [user_id]
+    query = 'SELECT id, message, is_bot, timestamp FROM chat_history WHERE user_id = ?'
+    if before is not None:
+        query += ' AND id < ?'
+        params.append(before)
+    query += ' ORDER BY id DESC LIMIT ?'
+    params.append(limit + 1)
+    rows = [tuple(row) for row in conn.execute(query, params)]
+
+    params = [user_id]
+    query = 'SELECT last_id, payload FROM chat_history_archive WHERE user_id = ?'
+    if before is not None:
+        query += ' AND first_id < ?'
+        params.append(before)
+    query += ' ORDER BY last_id DESC'
+    for last_id, payload in conn.execute(query, params):
+        # Chunks come newest first, so once this one ends below the page it cannot contribute
+        if len(rows) > limit and last_id < rows[limit][0]:
+            break
+        rows.extend(tuple(row) for row in _unpack(payload) if before is None or row[0] < before)
+        rows.sort(reverse=True)
+        del rows[limit + 1:]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    messages = [{'id': row[0], 'message': row[1], 'is_bot': bool(row[2]), 'timestamp': row[3]} for row in rows]
+    return messages, (rows[-1][0] if has_more else None)
+
+
+def history_high_water_mark(conn, user_id: int) -> int:
+    """Newest message id a user has, hot or archived (0 for none); it only grows"""
+    return conn.execute('''
+        SELECT MAX(COALESCE((SELECT MAX(id) FROM chat_history WHERE user_id = ?), 0),
+                   COALESCE((SELECT MAX(last_id) FROM chat_history_archive WHERE user_id = ?), 0))
+    ''', (user_id, user_id)).fetchone()[0]
+
+
+class ChatArchiver:
+    """Background thread that periodically moves old chat history into the archive"""
+
+    def __init__(self, connect, interval: float, keep_messages: int, keep_days: int):
+        self.connect = connect
+        self.interval = interval
+        self.keep_messages = keep_messages
+        self.keep_days = keep_days
+        self.last_report = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='chat-archiver', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> Dict[str, int]:
+        """Run a single archive pass and remember its report"""
+        started = time.monotonic()
+        conn = self.connect()
+        try:
+            self.last_report = archive_chat_history(conn, self.keep_messages, self.keep_days)
+        finally:
+            conn.close()
+        self.last_report['seconds'] = round(time.monotonic() - started, 2)
+        if self.last_report['archived']:
+            print(f"Chat archive: moved {self.last_report['archived']} messages into "
+                  f"{self.last_report['chunks']} chunks in {self.last_report['seconds']}s")
+        return self.last_report
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Chat archive error: {str(e)}")
@@ -0,0 +1,119 @@
+import re
+from typing import Iterable, Optional, Sequence, Tuple
+
+# Intent keywords, highest priority first
+INTENT_KEYWORDS = [
+    ('greeting', ['hi', 'hello', 'hey', 'greetings']),
+    ('recommend', ['recommend', 'suggest', 'find', 'looking for', 'want to watch', 'show me']),
+    ('mood', ['feel', 'mood', 'feeling', 'vibe']),
+    ('watch_time', ['watched', 'watch time', 'how long', 'how much']),
+    ('help', ['help', 'what can you do', 'commands']),
+]
+
+# Genre mappings for mood-based recommendations
+MOOD_GENRE_MAP = {
+    'happy': ['Comedy', 'Adventure', 'Fantasy'],
+    'sad': ['Drama', 'Romance'],
+    'excited': ['Action', 'Sci-Fi', 'Thriller'],
+    'scared': ['Horror', 'Mystery', 'Thriller'],
+    'romantic': ['Romance', 'Drama'],
+    'adventurous': ['Adventure', 'Action', 'Fantasy'],
+    'thoughtful': ['Drama', 'Sci-Fi', 'Mystery'],
+    'relaxed': ['Comedy', 'Romance', 'Adventure'],
+    'tense': ['Thriller', 'Horror', 'Crime']
+}
+
+# Genre keywords for detection
+GENRE_KEYWORDS = {
+    'action': 'Action',
+    'comedy': 'Comedy',
+    'drama': 'Drama',
+    'horror': 'Horror',
+    'scifi': 'Sci-Fi',
+    'sci-fi': 'Sci-Fi',
+    'science fiction': 'Sci-Fi',
+    'romance': 'Romance',
+    'thriller': 'Thriller',
+    'mystery': 'Mystery',
+    'adventure': 'Adventure',
+    'fantasy': 'Fantasy',
+    'crime': 'Crime',
+    'war': 'War'
+}
+
+# Inflections accepted after keywords of at least this length ("recommends",
+# "thrillers"); shorter ones must match exactly so "hi" never matches "his"
+INFLECTIONS = ('s', 'es', 'ed', 'ing', 'ation', 'ations')
+MIN_INFLECTED_LENGTH = 4
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Build a regex alternation factored by shared prefixes, e.g. feel(?:ing)?"""
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def build(node):
+        branches = [(r'\s+' if ch == ' ' else re.escape(ch)) + build(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A word ends here, so the rest of the branch is optional
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class ChatMatcher:
+    """Finds intent, genre and mood in a message with one precompiled regex pass
+
+    Every keyword (plus inflected forms like "recommends") is compiled into a
+    single prefix-factored alternation anchored on word boundaries, so "this"
+    is not a greeting and "award" is not a war movie. When several keywords
+    of the same kind match, the one listed first wins, as with the original
+    keyword lists.
+    """
+
+    def __init__(self, intent_keywords: Sequence[Tuple[str, Sequence[str]]],
+                 genre_keywords: dict, moods: Iterable[str]):
+        entries = []
+        for priority, (intent, words) in enumerate(intent_keywords):
+            entries.extend((word, ('intent', intent, priority)) for word in words)
+        for priority, (word, genre) in enumerate(genre_keywords.items()):
+            entries.append((word, ('genre', genre, priority)))
+        for priority, mood in enumerate(moods):
+            entries.append((mood, ('mood', mood, priority)))
+
+        # Keyword -> (kind, value, priority), with inflected forms expanded up front
+        self._keywords = {}
+        for word, entry in entries:
+            self._keywords.setdefault(word, entry)
+        for word, entry in entries:
+            if ' ' not in word and len(word) >= MIN_INFLECTED_LENGTH:
+                for suffix in INFLECTIONS:
+                    self._keywords.setdefault(word + suffix, entry)
+
+        self._pattern = re.compile(r'\b(' + _trie_pattern(self._keywords) + r')\b')
+
+    def match(self, message: str) -> Tuple[str, Optional[str], Optional[str]]:
+        """Return (intent, genre, mood) for a message; intent defaults to 'general'"""
+        keywords = self._keywords
+        best = {}
+        for word in self._pattern.findall(message.lower()):
+            entry = keywords.get(word) or keywords[' '.join(word.split())]
+            kind, value, priority = entry
+            current = best.get(kind)
+            if current is None or priority < current[1]:
+                best[kind] = (value, priority)
+
+        intent = best['intent'][0] if 'intent' in best else 'general'
+        genre = best['genre'][0] if 'genre' in best else None
+        mood = best['mood'][0] if 'mood' in best else None
+        return intent, genre, mood
+
+
+default_matcher = ChatMatcher(INTENT_KEYWORDS, GENRE_KEYWORDS, MOOD_GENRE_MAP.keys())
@@ -0,0 +1,139 @@
+import zlib
+from typing import Optional
+
+from werkzeug.datastructures import Headers
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always offered
+    brotli = None
+
+# Content types worth compressing; images and fonts are compressed already
+COMPRESSIBLE_TYPES = ('text/html', 'text/css', 'text/plain', 'text/javascript', 'application/javascript',
+                      'application/json', 'image/svg+xml')
+# Bodies smaller than this are sent as-is (headers would outweigh the savings)
+MIN_SIZE = 500
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Content codings an Accept-Encoding header allows (those not given q=0)"""
+    accepted = set()
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip())
+    return accepted
+
+
+class _Gzip:
+    def __init__(self):
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _Brotli:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses text responses for clients that accept it
+
+    Buffered responses are compressed in one go; streamed ones (no
+    Content-Length) are flushed after every chunk so each piece still
+    reaches the client as soon as the app yields it. Responses that are
+    already encoded, event streams, HEAD requests and bodies under MIN_SIZE
+    pass through untouched.
+    """
+
+    def __init__(self, app, min_size: int = MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    def _encoding(self, environ) -> Optional[str]:
+        if environ.get('REQUEST_METHOD') == 'HEAD':
+            return None
+        accepted = accepted_encodings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def _compressible(self, status: str, headers: Headers) -> bool:
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES or not status.startswith('200'):
+            return False
+        if 'Content-Encoding' in headers or 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        length = headers.get('Content-Length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = self._encoding(environ)
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        state = {}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            headers = Headers(headers)
+            content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+            vary = headers.get('Vary', '')
+            if content_type in COMPRESSIBLE_TYPES and 'accept-encoding' not in vary.lower():
+                headers['Vary'] = f'{vary}, Accept-Encoding' if vary else 'Accept-Encoding'
+            if self._compressible(status, headers):
+                state['streamed'] = 'Content-Length' not in headers
+                state['compressor'] = _Brotli() if encoding == 'br' else _Gzip()
+                del headers['Content-Length']
+                headers['Content-Encoding'] = encoding
+                # The encoded bytes differ, so a strong validator no longer holds
+                etag = headers.get('ETag')
+                if etag and not etag.startswith('W/'):
+                    headers['ETag'] = f'W/{etag}'
+            state['started'] = True
+            return start_response(status, headers.to_wsgi_list(), exc_info)
+
+        app_iter = self.app(environ, compressing_start_response)
+        if state.get('started') and 'compressor' not in state:
+            return app_iter
+        return self._compress(app_iter, state)
+
+    @staticmethod
+    def _compress(app_iter, state):
+        try:
+            for chunk in app_iter:
+                compressor = state.get('compressor')
+                if compressor is None:
+                    yield chunk
+                    continue
+                data = compressor.compress(chunk)
+                if state['streamed']:
+                    data += compressor.flush()
+                if data:
+                    yield data
+            if state.get('compressor') is not None:
+                yield state['compressor'].finish()
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
@@ -0,0 +1,176 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+
+class EventBus:
+    """Per-user fan-out of server-sent events, shared across worker processes
+
+    Every open /events stream subscribes a bounded queue for its user;
+    delivery drops events for a subscriber whose queue is full rather than
+    blocking. With a path, publish() appends to a small SQLite event log and
+    each process that holds streams polls it, so an event published by one
+    gunicorn worker reaches streams held by any other. Without a path,
+    events only reach streams in the publishing process.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_queue: int = 256,
+                 poll_interval: float = 0.1, retention: float = 60.0):
+        self.path = path
+        self.max_queue = max_queue
+        self.poll_interval = poll_interval
+        # Logged events older than this many seconds are pruned by publishers
+        self.retention = retention
+        self._subscribers: Dict[Any, set] = {}
+        self._lock = threading.Lock()
+        # Serializes log writes without holding up subscribe/deliver on self._lock
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        # Per-process state, reset after a fork: the publishing connection and the log poller
+        self._pid = None
+        self._conn = None
+        self._poller = None
+        self._last_id = 0
+        self._published = 0
+        atexit.register(self.stop)
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key,
+                event TEXT NOT NULL,
+                data TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        ''')
+        return conn
+
+    def _process_state(self) -> None:
+        """Drop state inherited from a parent process; call with self._lock held"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._subscribers = {}
+            self._conn = self._connect() if self.path else None
+            self._poller = None
+            self._stop = threading.Event()
+
+    def subscribe(self, key) -> queue.Queue:
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._process_state()
+            if self.path and (self._poller is None or not self._poller.is_alive()):
+                # Start from the current end of the log: only later events reach this stream
+                with self._write_lock:
+                    self._last_id = self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+                self._stop.clear()
+                self._poller = threading.Thread(target=self._poll, name='event-bus-poller', daemon=True)
+                self._poller.start()
+            self._subscribers.setdefault(key, set()).add(q)
+        return q
+
+    def unsubscribe(self, key, q: queue.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(q)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def publish(self, key, event: str, data: Any) -> None:
+        """Queue an event for every stream of `key`, in any process sharing the log"""
+        if not self.path:
+            self._deliver(key, event, data)
+            return
+        now = time.time()
+        with self._lock:
+            self._process_state()
+            conn = self._conn
+        with self._write_lock:
+            conn.execute('INSERT INTO events (key, event, data, created) VALUES (?, ?, ?, ?)',
+                         (key, event, json.dumps(data), now))
+            self._published += 1
+            if self._published % 100 == 0:
+                conn.execute('DELETE FROM events WHERE created < ?', (now - self.retention,))
+
+    def stop(self) -> None:
+        """Stop the log poller and end every open stream in this process"""
+        self._stop.set()
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            poller = self._poller
+            subscribers = [q for qs in self._subscribers.values() for q in qs]
+        for q in subscribers:
+            try:
+                q.put_nowait(None)
+            except queue.Full:
+                pass
+        if poller is not None and poller is not threading.current_thread():
+            poller.join(timeout=1)
+
+    def _deliver(self, key, event: str, data: Any) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for q in subscribers:
+            try:
+                q.put_nowait((event, data))
+            except queue.Full:
+                pass
+
+    def _poll(self) -> None:
+        """Hand new log rows to this process's streams until stop()"""
+        conn = self._connect()
+        stop = self._stop
+        while not stop.wait(self.poll_interval):
+            with self._lock:
+                if not self._subscribers:
+                    # No streams in this process: move past the log instead of reading its rows
+                    self._last_id = conn.execute('SELECT COALESCE(MAX(id), ?) FROM events',
+                                                 (self._last_id,)).fetchone()[0]
+                    continue
+                last_id = self._last_id
+            rows = conn.execute('SELECT id, key, event, data FROM events WHERE id > ? ORDER BY id',
+                                (last_id,)).fetchall()
+            for row_id, key, event, data in rows:
+                self._deliver(key, event, json.loads(data))
+                last_id = row_id
+            with self._lock:
+                self._last_id = last_id
+        conn.close()
+
+    def stream(self, key, keepalive: float = 15.0) -> Iterator[str]:
+        """Yield text/event-stream frames for `key` until the client disconnects
+
+        The subscription is made before the first frame is sent, so anything
+        published once the client sees the stream open is delivered.
+        """
+        q = self.subscribe(key)
+        try:
+            # Reconnect quickly if the connection drops
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    item = q.get(timeout=keepalive)
+                except queue.Empty:
+                    # Comment frame keeps proxies from closing an idle stream
+                    yield ': keepalive\n\n'
+                    continue
+                if item is None:
+                    # The bus was stopped (process shutting down); the client reconnects elsewhere
+                    return
+                event, data = item
+                yield f'event: {event}\ndata: {json.dumps(data)}\n\n'
+        finally:
+            self.unsubscribe(key, q)
@@ -0,0 +1,56 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the single-process dev server runs there
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock on a file shared by every process on the host (flock)
+
+    The kernel drops the lock when its holder exits, however it exits, so a
+    crashed worker never leaves a stale lock behind.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._lock = threading.Lock()
+
+    def _open(self) -> int:
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Take the lock, waiting for it unless blocking is False; return whether it is held"""
+        if not self._lock.acquire(blocking):
+            return False
+        fd = self._open()
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BaseException as e:
+            os.close(fd)
+            self._lock.release()
+            if isinstance(e, BlockingIOError):
+                return False
+            raise
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+            self._lock.release()
+
+    def __enter__(self) -> 'FileLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
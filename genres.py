@@ -0,0 +1,46 @@
+from typing import Iterable, List
+
+# TMDB movie genre ids and the names shown in CINEGO. The position of each id
+# is its bit in the genre_mask columns, so only ever append to this list.
+GENRE_NAMES = {
+    28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy',
+    80: 'Crime', 99: 'Documentary', 18: 'Drama', 10751: 'Family',
+    14: 'Fantasy', 36: 'History', 27: 'Horror', 10402: 'Music',
+    9648: 'Mystery', 10749: 'Romance', 878: 'Sci-Fi', 10770: 'TV Movie',
+    53: 'Thriller', 10752: 'War', 37: 'Western'
+}
+
+GENRE_BITS = {genre_id: bit for bit, genre_id in enumerate(GENRE_NAMES)}
+
+GENRE_IDS_BY_NAME = {name: genre_id for genre_id, name in GENRE_NAMES.items()}
+
+# TV-only TMDB genres folded onto the movie genres above
+TV_GENRE_ALIASES = {
+    10759: (28, 12),     # Action & Adventure
+    10762: (10751,),     # Kids
+    10765: (878, 14),    # Sci-Fi & Fantasy
+    10768: (10752,),     # War & Politics
+}
+
+
+def normalize_genre_ids(genre_ids: Iterable[int]) -> List[int]:
+    """Known movie genre ids for a TMDB genre_ids list, TV aliases expanded, in order"""
+    normalized = []
+    for genre_id in genre_ids:
+        for known in TV_GENRE_ALIASES.get(genre_id, (genre_id,)):
+            if known in GENRE_BITS and known not in normalized:
+                normalized.append(known)
+    return normalized
+
+
+def genre_mask(genre_ids: Iterable[int]) -> int:
+    """Bitmask with one bit set per known genre id"""
+    mask = 0
+    for genre_id in normalize_genre_ids(genre_ids):
+        mask |= 1 << GENRE_BITS[genre_id]
+    return mask
+
+
+def mask_for_names(names: Iterable[str]) -> int:
+    """Bitmask for genre names such as 'Sci-Fi'; unknown names are ignored"""
+    return genre_mask(GENRE_IDS_BY_NAME[name] for name in names if name in GENRE_IDS_BY_NAME)
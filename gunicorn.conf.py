@@ -0,0 +1,61 @@
+"""Production pre-fork settings: `gunicorn -c gunicorn.conf.py wsgi:app`
+
+The master runs the one-time setup (migrations, TMDB seeding, similarity
+index, static assets) in a child `flask init-db` process before starting
+the workers, so workers import the app without touching the network or the
+schema. SIGHUP replaces the workers with ones importing the current code and
+templates; each new worker rebuilds the static assets before serving, so
+changed static files go out too. A reload does not migrate; deploys that add
+migrations need a full restart. Command
+line flags (or GUNICORN_CMD_ARGS) override anything here; the CINEGO_*
+variables below cover the usual knobs.
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Workers must not initialize on import; the master runs init-db once instead
+os.environ.setdefault('CINEGO_INIT_ON_IMPORT', '0')
+
+bind = os.environ.get('CINEGO_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# Threaded workers: request handlers mostly wait on SQLite and template
+# rendering, and each open /events stream holds one thread for its lifetime
+worker_class = 'gthread'
+workers = int(os.environ.get('CINEGO_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('CINEGO_THREADS', 16))
+
+# No preload: each worker imports the app itself, so a SIGHUP reload picks up new code
+preload_app = False
+
+# Recycle workers now and then to bound memory growth; jitter avoids all restarting together
+max_requests = 2000
+max_requests_jitter = 200
+
+# In-flight requests get this long to finish on SIGHUP/SIGTERM before a worker is killed
+graceful_timeout = 30
+timeout = 60
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def _init_db():
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'],
+                   check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def on_starting(server):
+    # A separate process, so the master never imports the app or opens its database. Not repeated
+    # on SIGHUP: migrating while the old workers still serve could break them mid-request
+    _init_db()
+
+
+def post_worker_init(worker):
+    # Publish the current static files (a no-op unless a reload brought new ones), then
+    # elect the one worker that runs the refresher, archiver and trainer; the rest stand by
+    from app import build_static_assets, start_background_jobs
+    build_static_assets()
+    start_background_jobs()
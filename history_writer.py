@@ -0,0 +1,76 @@
+import atexit
+import os
+import queue
+import threading
+
+
+class HistoryWriter:
+    """Background append queue for chat_history rows
+
+    Requests enqueue (user_id, message, is_bot, timestamp) rows and return
+    at once; a writer thread drains the queue and inserts everything it has
+    in one transaction, so reply latency never includes a disk sync.
+    """
+
+    INSERT_SQL = 'INSERT INTO chat_history (user_id, message, is_bot, timestamp) VALUES (?, ?, ?, ?)'
+
+    def __init__(self, connect, max_batch: int = 500):
+        self.connect = connect
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.stop)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='chat-history-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write out everything queued and stop the writer thread"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+        self._write(self._drain())
+
+    def append(self, rows) -> None:
+        """Queue rows for insertion without waiting for the database"""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self.start()
+        for row in rows:
+            self._queue.put(row)
+
+    def _drain(self, first=None):
+        batch = [first] if first is not None else []
+        while len(batch) < self.max_batch:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                continue
+            batch.append(row)
+        return batch
+
+    def _write(self, batch) -> None:
+        if not batch:
+            return
+        try:
+            conn = self.connect()
+            try:
+                with conn:
+                    conn.executemany(self.INSERT_SQL, batch)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Chat history write error: {str(e)}")
+
+    def _run(self) -> None:
+        while True:
+            row = self._queue.get()
+            if row is None:
+                return
+            self._write(self._drain(row))
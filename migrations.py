@@ -0,0 +1,427 @@
+import sqlite3
+from typing import List, Tuple
+
+from genres import GENRE_BITS, GENRE_NAMES
+
+def _seed_genres(conn) -> None:
+    conn.executemany('INSERT OR IGNORE INTO genres (id, bit, name) VALUES (?, ?, ?)',
+                     [(genre_id, GENRE_BITS[genre_id], name) for genre_id, name in GENRE_NAMES.items()])
+
+
+def _genre_link_triggers(table: str, link_table: str, key: str) -> List[str]:
+    """Triggers that keep a (key, genre_id) link table in step with table.genre_mask"""
+    link = f'''
+            INSERT INTO {link_table} ({key}, genre_id)
+            SELECT NEW.id, id FROM genres WHERE NEW.genre_mask & (1 << bit);'''
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {link_table}_insert AFTER INSERT ON {table}
+        BEGIN{link}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {link_table}_update AFTER UPDATE OF genre_mask ON {table}
+        BEGIN
+            DELETE FROM {link_table} WHERE {key} = OLD.id;{link}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {link_table}_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM {link_table} WHERE {key} = OLD.id;
+        END
+        ''',
+    ]
+
+
+# Ordered schema migrations: (version, description, steps).
+# A step is either an SQL statement or a callable taking the connection.
+# The applied version is tracked in PRAGMA user_version; never edit a
+# migration that has shipped, append a new one instead.
+MIGRATIONS = [
+    (1, 'initial schema', [
+        '''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS movies (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            year INTEGER,
+            genre TEXT,
+            rating REAL,
+            image_url TEXT,
+            description TEXT,
+            is_trending BOOLEAN DEFAULT 0,
+            view_count INTEGER DEFAULT 0,
+            video_url TEXT,
+            trailer_url TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS series (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL,
+            year INTEGER,
+            genre TEXT,
+            rating REAL,
+            image_url TEXT,
+            description TEXT,
+            seasons INTEGER DEFAULT 1,
+            video_url TEXT,
+            trailer_url TEXT
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS chat_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            is_bot BOOLEAN DEFAULT 0,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS watch_time (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            movie_id INTEGER NOT NULL,
+            date DATE DEFAULT CURRENT_DATE,
+            minutes_watched INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id),
+            FOREIGN KEY (movie_id) REFERENCES movies(id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            favorite_genres TEXT,
+            last_genre_watched TEXT,
+            total_watch_time INTEGER DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+        ''',
+    ]),
+    (2, 'indexes for hot queries', [
+        # Watch-time lookups and daily sums; minutes_watched makes it covering
+        'CREATE INDEX IF NOT EXISTS idx_watch_time_user_date '
+        'ON watch_time (user_id, date, movie_id, minutes_watched)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_user_time ON chat_history (user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_movies_genre_rank ON movies (genre, rating DESC, view_count DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_movies_trending ON movies (is_trending, view_count DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_movies_view_count ON movies (view_count DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_movies_rating ON movies (rating DESC, view_count DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_series_rating ON series (rating DESC)',
+        'CREATE INDEX IF NOT EXISTS idx_series_genre ON series (genre)',
+    ]),
+    (3, 'unique watch_time key and daily rollup', [
+        # Fold duplicate heartbeat rows into the oldest one before adding the key
+        '''
+        UPDATE watch_time SET minutes_watched = (
+            SELECT SUM(w.minutes_watched) FROM watch_time w
+            WHERE w.user_id = watch_time.user_id AND w.movie_id = watch_time.movie_id AND w.date = watch_time.date
+        )
+        WHERE id IN (SELECT MIN(id) FROM watch_time GROUP BY user_id, movie_id, date HAVING COUNT(*) > 1)
+        ''',
+        'DELETE FROM watch_time WHERE id NOT IN (SELECT MIN(id) FROM watch_time GROUP BY user_id, movie_id, date)',
+        'DROP INDEX IF EXISTS idx_watch_time_user_date',
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_watch_time_key ON watch_time (user_id, movie_id, date)',
+        '''
+        CREATE TABLE IF NOT EXISTS watch_time_daily (
+            user_id INTEGER NOT NULL,
+            date DATE NOT NULL,
+            minutes_watched INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, date)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO watch_time_daily (user_id, date, minutes_watched)
+        SELECT user_id, date, SUM(minutes_watched) FROM watch_time GROUP BY user_id, date
+        ''',
+        # Triggers keep the rollup exact whichever code path writes watch_time
+        '''
+        CREATE TRIGGER IF NOT EXISTS watch_time_daily_insert AFTER INSERT ON watch_time
+        BEGIN
+            INSERT INTO watch_time_daily (user_id, date, minutes_watched)
+            VALUES (NEW.user_id, NEW.date, NEW.minutes_watched)
+            ON CONFLICT (user_id, date) DO UPDATE SET minutes_watched = minutes_watched + excluded.minutes_watched;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS watch_time_daily_update AFTER UPDATE OF minutes_watched ON watch_time
+        BEGIN
+            UPDATE watch_time_daily SET minutes_watched = minutes_watched + NEW.minutes_watched - OLD.minutes_watched
+            WHERE user_id = NEW.user_id AND date = NEW.date;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS watch_time_daily_delete AFTER DELETE ON watch_time
+        BEGIN
+            UPDATE watch_time_daily SET minutes_watched = minutes_watched - OLD.minutes_watched
+            WHERE user_id = OLD.user_id AND date = OLD.date;
+        END
+        ''',
+    ]),
+    (4, 'catalog version key', [
+        'CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)',
+        "INSERT OR IGNORE INTO catalog_meta (key, value) VALUES ('version', 1)",
+    ]),
+    (5, 'keyset pagination indexes', [
+        'DROP INDEX IF EXISTS idx_movies_rating',
+        'DROP INDEX IF EXISTS idx_movies_view_count',
+        'DROP INDEX IF EXISTS idx_series_rating',
+        'CREATE INDEX IF NOT EXISTS idx_movies_rating_id ON movies (rating, id)',
+        'CREATE INDEX IF NOT EXISTS idx_movies_views_id ON movies (view_count, id)',
+        'CREATE INDEX IF NOT EXISTS idx_series_rating_id ON series (rating, id)',
+    ]),
+    # External-content FTS5 indexes over title and description, kept in sync
+    # by triggers; view_count and rating updates do not touch them
+    (6, 'full-text search', [
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5(
+            title, description,
+            content='movies', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_insert AFTER INSERT ON movies
+        BEGIN
+            INSERT INTO movies_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_delete AFTER DELETE ON movies
+        BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS movies_fts_update AFTER UPDATE OF title, description ON movies
+        BEGIN
+            INSERT INTO movies_fts (movies_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            INSERT INTO movies_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''',
+        "INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')",
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS series_fts USING fts5(
+            title, description,
+            content='series', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS series_fts_insert AFTER INSERT ON series
+        BEGIN
+            INSERT INTO series_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS series_fts_delete AFTER DELETE ON series
+        BEGIN
+            INSERT INTO series_fts (series_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS series_fts_update AFTER UPDATE OF title, description ON series
+        BEGIN
+            INSERT INTO series_fts (series_fts, rowid, title, description)
+            VALUES ('delete', OLD.id, OLD.title, OLD.description);
+            INSERT INTO series_fts (rowid, title, description) VALUES (NEW.id, NEW.title, NEW.description);
+        END
+        ''',
+        "INSERT INTO series_fts (series_fts) VALUES ('rebuild')",
+    ]),
+    # Chat history is paged by id; rows past the retention window move into
+    # zlib-compressed JSON chunks of [id, message, is_bot, timestamp]
+    (7, 'chat history archive', [
+        '''
+        CREATE TABLE IF NOT EXISTS chat_history_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            first_id INTEGER NOT NULL,
+            last_id INTEGER NOT NULL,
+            first_timestamp TIMESTAMP NOT NULL,
+            last_timestamp TIMESTAMP NOT NULL,
+            message_count INTEGER NOT NULL,
+            payload BLOB NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_chat_archive_user_last ON chat_history_archive (user_id, last_id)',
+        'DROP INDEX IF EXISTS idx_chat_history_user_time',
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_user_id ON chat_history (user_id, id)',
+    ]),
+    # Every TMDB genre of a title, as a bitmask column (bit = genres.bit) and as
+    # link tables derived from it by triggers. Existing rows start from their
+    # primary genre and pick up the rest on the next catalog refresh.
+    (8, 'multi-genre storage', [
+        '''
+        CREATE TABLE IF NOT EXISTS genres (
+            id INTEGER PRIMARY KEY,
+            bit INTEGER UNIQUE NOT NULL,
+            name TEXT NOT NULL
+        )
+        ''',
+        _seed_genres,
+        'ALTER TABLE movies ADD COLUMN genre_mask INTEGER NOT NULL DEFAULT 0',
+        'ALTER TABLE series ADD COLUMN genre_mask INTEGER NOT NULL DEFAULT 0',
+        '''
+        CREATE TABLE IF NOT EXISTS movie_genres (
+            movie_id INTEGER NOT NULL REFERENCES movies (id),
+            genre_id INTEGER NOT NULL REFERENCES genres (id),
+            PRIMARY KEY (movie_id, genre_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_movie_genres_genre ON movie_genres (genre_id, movie_id)',
+        '''
+        CREATE TABLE IF NOT EXISTS series_genres (
+            series_id INTEGER NOT NULL REFERENCES series (id),
+            genre_id INTEGER NOT NULL REFERENCES genres (id),
+            PRIMARY KEY (series_id, genre_id)
+        ) WITHOUT ROWID
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_series_genres_genre ON series_genres (genre_id, series_id)',
+        *_genre_link_triggers('movies', 'movie_genres', 'movie_id'),
+        *_genre_link_triggers('series', 'series_genres', 'series_id'),
+        'UPDATE movies SET genre_mask = COALESCE((SELECT 1 << bit FROM genres WHERE name = movies.genre), 0)',
+        'UPDATE series SET genre_mask = COALESCE((SELECT 1 << bit FROM genres WHERE name = series.genre), 0)',
+    ]),
+    # Per-user top-N from the collaborative-filtering job (collaborative.py);
+    # because_id is the watched title that explains each pick
+    (9, 'collaborative recommendations', [
+        '''
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            rank INTEGER NOT NULL,
+            movie_id INTEGER NOT NULL REFERENCES movies (id),
+            because_id INTEGER NOT NULL REFERENCES movies (id),
+            score REAL NOT NULL,
+            PRIMARY KEY (user_id, rank)
+        ) WITHOUT ROWID
+        ''',
+    ]),
+    # Genre lookups go through genre_mask and the genre link tables now; these indexes
+    # only slowed catalog writes and view-count flushes
+    (10, 'drop unused genre indexes', [
+        'DROP INDEX IF EXISTS idx_movies_genre_rank',
+        'DROP INDEX IF EXISTS idx_series_genre',
+    ]),
+    # Keyset paging sorts on COALESCE(column, -1) so NULL ratings and counts keep a
+    # place in the order; rebuild the (column, id) indexes on that expression
+    (11, 'null-safe keyset indexes', [
+        'DROP INDEX IF EXISTS idx_movies_rating_id',
+        'DROP INDEX IF EXISTS idx_movies_views_id',
+        'DROP INDEX IF EXISTS idx_series_rating_id',
+        'CREATE INDEX idx_movies_rating_id ON movies (COALESCE(rating, -1), id)',
+        'CREATE INDEX idx_movies_views_id ON movies (COALESCE(view_count, -1), id)',
+        'CREATE INDEX idx_series_rating_id ON series (COALESCE(rating, -1), id)',
+    ]),
+]
+
+# Hot queries and the index EXPLAIN QUERY PLAN must report for each
+HOT_QUERIES = [
+    ('SELECT id, minutes_watched FROM watch_time WHERE user_id = ? AND movie_id = ? AND date = ?',
+     (1, 1, '2024-01-01'), 'idx_watch_time_key'),
+    ('SELECT minutes_watched FROM watch_time_daily WHERE user_id = ? AND date = ?',
+     (1, '2024-01-01'), 'PRIMARY KEY'),
+    ('SELECT id, message, is_bot, timestamp FROM chat_history WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?',
+     (1, 100, 50), 'idx_chat_history_user_id'),
+    ('SELECT last_id, payload FROM chat_history_archive WHERE user_id = ? AND first_id < ? ORDER BY last_id DESC',
+     (1, 100), 'idx_chat_archive_user_last'),
+    ('SELECT DISTINCT movie_id FROM watch_time WHERE user_id = ?', (1,), 'idx_watch_time_key'),
+    ('SELECT * FROM movies WHERE is_trending = 1 ORDER BY view_count DESC LIMIT 10',
+     (), 'idx_movies_trending'),
+    ('SELECT * FROM movies WHERE COALESCE(view_count, -1) <= ? AND (COALESCE(view_count, -1), id) < (?, ?) '
+     'ORDER BY COALESCE(view_count, -1) DESC, id DESC LIMIT ?', (100, 100, 1, 24), 'idx_movies_views_id'),
+    ('SELECT * FROM movies WHERE COALESCE(rating, -1) <= ? AND (COALESCE(rating, -1), id) < (?, ?) '
+     'ORDER BY COALESCE(rating, -1) DESC, id DESC LIMIT ?', (7.5, 7.5, 1, 24), 'idx_movies_rating_id'),
+    ('SELECT * FROM series WHERE COALESCE(rating, -1) <= ? AND (COALESCE(rating, -1), id) < (?, ?) '
+     'ORDER BY COALESCE(rating, -1) DESC, id DESC LIMIT ?', (7.5, 7.5, 1, 24), 'idx_series_rating_id'),
+    ('SELECT * FROM series ORDER BY COALESCE(rating, -1) DESC', (), 'idx_series_rating_id'),
+    ('SELECT * FROM movies WHERE genre_mask & ? AND id != ? ORDER BY COALESCE(rating, -1) DESC, id DESC LIMIT 6',
+     (1, 1), 'idx_movies_rating_id'),
+    ('SELECT * FROM series WHERE genre_mask & ? AND id != ? ORDER BY COALESCE(rating, -1) DESC, id DESC LIMIT 6',
+     (1, 1), 'idx_series_rating_id'),
+    ('SELECT movie_id FROM movie_genres WHERE genre_id IN (?, ?)', (28, 12), 'idx_movie_genres_genre'),
+    ('SELECT movie_id, because_id FROM user_recommendations WHERE user_id = ? ORDER BY rank LIMIT ?',
+     (1, 20), 'PRIMARY KEY'),
+]
+
+
+def current_version(conn) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn) -> List[int]:
+    """Apply pending migrations in order, one transaction each; return the versions applied"""
+    applied = []
+    version = current_version(conn)
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        print(f"Applying migration {target}: {description}")
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-check under the write lock in case another process got here first
+            if current_version(conn) >= target:
+                conn.rollback()
+                version = current_version(conn)
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f'PRAGMA user_version = {int(target)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(target)
+        version = target
+    return applied
+
+
+def explain(conn, sql: str, params: tuple = ()) -> List[str]:
+    """Return the detail lines of EXPLAIN QUERY PLAN for a query"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def check_query_plans(conn) -> List[Tuple[str, List[str]]]:
+    """Return (query, plan) for every hot query whose plan skips its expected index"""
+    failures = []
+    for sql, params, index in HOT_QUERIES:
+        plan = explain(conn, sql, params)
+        if not any(index in line for line in plan):
+            failures.append((sql, plan))
+    return failures
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join('instance', 'cinego.db')
+    conn = sqlite3.connect(db_path)
+    migrate(conn)
+    version = current_version(conn)
+    failures = check_query_plans(conn)
+    conn.close()
+    for sql, plan in failures:
+        print(f"Index not used: {sql}\n    {plan}")
+    if failures:
+        sys.exit(1)
+    print(f"Schema at version {version}; all hot queries use their indexes")
@@ -0,0 +1,34 @@
+import threading
+import time
+
+
+class VersionedCache:
+    """In-memory cache whose entries are tied to a version key and an optional max age
+
+    Entries built for an older version are rebuilt on the next lookup, so a
+    writer only has to bump the version to invalidate everything derived
+    from it.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version, build):
+        """Return the cached value for key at version, calling build() on a miss"""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, built_at, value = entry
+            if entry_version == version and (not self.ttl or now - built_at < self.ttl):
+                return value
+
+        value = build()
+        with self._lock:
+            self._entries[key] = (version, now, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
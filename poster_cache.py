@@ -0,0 +1,146 @@
+import io
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillow is optional; without it TMDB's own sizes are stored as-is
+    Image = None
+
+from tmdb_client import TMDBClient
+
+# Display widths per variant, matching TMDB's w185/w342/w500 renditions
+VARIANTS = {'grid': 185, 'card': 342, 'detail': 500}
+
+# TMDB poster URLs of any size; the file name is unique per uploaded image,
+# so a URL built from it never needs to change for the same bytes. Any host
+# is accepted (e.g. a stand-in TMDB) since posters are always fetched from
+# the configured image base, never from the stored URL.
+TMDB_POSTER_RE = re.compile(r'^https?://[^/?#]+/t/p/[a-z0-9]+/([A-Za-z0-9_-]{1,64})\.jpg$')
+NAME_RE = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+MIMETYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+# Seconds before a poster that failed to download is tried again
+RETRY_AFTER = 600
+
+# Posters hash onto this many download locks, so the lock table stays fixed in size
+LOCK_STRIPES = 64
+
+JPEG_QUALITY = 82
+WEBP_QUALITY = 78
+
+
+def poster_name(image_url: Optional[str]) -> Optional[str]:
+    """TMDB file name (without extension) for a stored image_url, or None for anything else"""
+    match = TMDB_POSTER_RE.match(image_url or '')
+    return match.group(1) if match else None
+
+
+class PosterCache:
+    """Fetches each TMDB poster once and keeps resized variants on disk
+
+    With Pillow the w500 original is downloaded once and every variant is
+    written as JPEG and WebP; without it, TMDB's own w185/w342/w500 JPEGs
+    are stored per variant.
+    """
+
+    def __init__(self, directory: str, image_base: str = 'https://image.tmdb.org/t/p'):
+        self.directory = directory
+        self.image_base = image_base.rstrip('/')
+        self.formats = ('webp', 'jpg') if Image is not None and features.check('webp') else ('jpg',)
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+        self._session_lock = threading.Lock()
+        self._failed: Dict[str, float] = {}
+        self._session = None
+
+    def path(self, variant: str, name: str, fmt: str) -> str:
+        return os.path.join(self.directory, variant, f'{name}.{fmt}')
+
+    def get(self, variant: str, name: str, fmt: str) -> Optional[str]:
+        """Path of a stored variant, fetching and resizing the poster on first use"""
+        if variant not in VARIANTS or fmt not in self.formats or not NAME_RE.match(name):
+            return None
+        path = self.path(variant, name, fmt)
+        if os.path.exists(path):
+            return path
+
+        if time.monotonic() < self._failed.get(name, 0):
+            return None
+
+        # One download per poster even when a grid requests every size at once
+        with self._locks[hash(name) % LOCK_STRIPES]:
+            if not os.path.exists(path):
+                self._build(name, variant)
+        if os.path.exists(path):
+            return path
+        now = time.monotonic()
+        if len(self._failed) >= 1024:
+            # Forget failures whose retry time has passed rather than keeping every name
+            self._failed = {n: until for n, until in self._failed.items() if until > now}
+        self._failed[name] = now + RETRY_AFTER
+        return None
+
+    def _get_session(self) -> requests.Session:
+        """Keep-alive session for the image host; unlike the API session it carries no credentials"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=TMDBClient.POOL_SIZE, pool_maxsize=TMDBClient.POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+        return self._session
+
+    def _fetch(self, size: str, name: str) -> Optional[bytes]:
+        try:
+            response = self._get_session().get(f'{self.image_base}/{size}/{name}.jpg',
+                                               timeout=TMDBClient.REQUEST_TIMEOUT)
+        except Exception as e:
+            print(f"Poster fetch error for {name}: {str(e)}")
+            return None
+        if response.status_code != 200:
+            print(f"Poster fetch for {name} returned {response.status_code}")
+            return None
+        return response.content
+
+    def _write(self, path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _build(self, name: str, variant: str) -> None:
+        if Image is None:
+            data = self._fetch(f'w{VARIANTS[variant]}', name)
+            if data is not None:
+                self._write(self.path(variant, name, 'jpg'), data)
+            return
+
+        data = self._fetch(f'w{max(VARIANTS.values())}', name)
+        if data is None:
+            return
+        try:
+            original = Image.open(io.BytesIO(data)).convert('RGB')
+        except Exception as e:
+            print(f"Poster decode error for {name}: {str(e)}")
+            return
+        for size_name, width in VARIANTS.items():
+            image = original
+            if original.width > width:
+                image = original.resize((width, round(original.height * width / original.width)), Image.LANCZOS)
+            for fmt in self.formats:
+                out = io.BytesIO()
+                if fmt == 'webp':
+                    image.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+                else:
+                    image.save(out, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                self._write(self.path(size_name, name, fmt), out.getvalue())
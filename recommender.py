@@ -0,0 +1,64 @@
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from genres import GENRE_NAMES, mask_for_names
+
+
+def _rank_key(movie: Dict) -> tuple:
+    return (-(movie['rating'] or 0), -(movie['view_count'] or 0), movie['id'])
+
+
+class GenreIndex:
+    """Precomputed top-K movies per genre and per mood, ordered by rating then views
+
+    Built once per catalog version so chat recommendations never query the
+    movies table. A movie counts for every genre in its genre_mask; while
+    building, the masks sit in an array parallel to the ranked catalog so
+    any-of-genres filters are one AND per movie. Lists hold more than a reply needs so
+    titles the user has already watched can be skipped without going back
+    to the database.
+    """
+
+    COLUMNS = 'id, title, year, genre, genre_mask, rating, view_count, image_url, description'
+
+    def __init__(self, by_genre: Dict[str, List[Dict]], by_mood: Dict[str, List[Dict]], overall: List[Dict]):
+        self.by_genre = by_genre
+        self.by_mood = by_mood
+        self.overall = overall
+
+    @classmethod
+    def build(cls, conn, mood_genre_map: Dict[str, List[str]], top_k: int = 50) -> 'GenreIndex':
+        """Load the catalog once and rank it per genre and per mood"""
+        movies = [dict(row) for row in conn.execute(f'SELECT {cls.COLUMNS} FROM movies')]
+        movies.sort(key=_rank_key)
+        masks = array('Q', (movie['genre_mask'] or 0 for movie in movies))
+
+        by_genre = {name: cls._select(movies, masks, mask_for_names([name]), top_k)
+                    for name in GENRE_NAMES.values()}
+        by_mood = {mood: cls._select(movies, masks, mask_for_names(genres), top_k)
+                   for mood, genres in mood_genre_map.items()}
+
+        return cls(by_genre, by_mood, movies[:top_k])
+
+    @staticmethod
+    def _select(movies: List[Dict], masks: array, mask: int, limit: int) -> List[Dict]:
+        selected = []
+        for i, movie_mask in enumerate(masks):
+            if movie_mask & mask:
+                selected.append(movies[i])
+                if len(selected) == limit:
+                    break
+        return selected
+
+    def top(self, genre: Optional[str] = None, mood: Optional[str] = None,
+            exclude: Iterable[int] = (), limit: int = 3) -> List[Dict]:
+        """Best movies for a genre, else a mood, else overall, skipping excluded ids"""
+        if genre:
+            ranked = self.by_genre.get(genre, [])
+        elif mood and mood in self.by_mood:
+            ranked = self.by_mood[mood]
+        else:
+            ranked = self.overall
+
+        exclude = set(exclude)
+        return [movie for movie in ranked if movie['id'] not in exclude][:limit]
@@ -0,0 +1,319 @@
+import os
+import re
+import threading
+import time
+import zipfile
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from genres import GENRE_BITS
+
+# Description terms are hashed into this many buckets (no vocabulary to keep)
+HASH_DIM = 1024
+# Neighbours stored per title
+TOP_K = 12
+# Blend of description similarity, shared genres and the neighbour's rating
+TEXT_WEIGHT = 0.5
+GENRE_WEIGHT = 0.35
+RATING_WEIGHT = 0.15
+# Rows scored per matrix product, bounding memory on large catalogs
+BLOCK_ROWS = 256
+# The TF-IDF matrix is kept sparse; this many of its rows are expanded at a time for a product
+TEXT_CHUNK_ROWS = 4096
+# Past this share of titles to rescore, a full rebuild is about as cheap as patching
+FULL_REBUILD_FRACTION = 0.25
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset('''
+    a about after an and are as at be but by for from has have he her his in into is it its of on or
+    out over she that the their them they this to up was when where which while who will with
+'''.split())
+
+
+def index_dtype(top_k: int) -> np.dtype:
+    return np.dtype([('id', '<i4'), ('fingerprint', '<u4'),
+                     ('neighbors', '<i4', (top_k,)), ('scores', '<f4', (top_k,))])
+
+
+def index_path(directory: str, table: str) -> str:
+    return os.path.join(directory, f'{table}.npy')
+
+
+def _term_path(directory: str, table: str) -> str:
+    return os.path.join(directory, f'{table}.terms.npz')
+
+
+def _fingerprint(description, genre_mask) -> int:
+    """Changes when a title's text or genres do; rating changes alone keep the neighbour lists"""
+    return zlib.crc32(f'{description or ""}\x1f{genre_mask or 0}'.encode())
+
+
+def _term_counts(description) -> Tuple[np.ndarray, np.ndarray]:
+    """Sorted hashed term buckets of a description and how often each occurs"""
+    buckets = [zlib.crc32(token.encode()) % HASH_DIM
+               for token in TOKEN_RE.findall((description or '').lower())
+               if token not in STOP_WORDS and len(token) > 1]
+    buckets, counts = np.unique(np.array(buckets, dtype=np.uint16), return_counts=True)
+    return buckets, counts.astype(np.uint16)
+
+
+def _load(path: str):
+    try:
+        return np.load(path, mmap_mode='r')
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _load_terms(path: str) -> Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]]:
+    """(id, fingerprint) -> term buckets and counts from the last build"""
+    try:
+        with np.load(path) as data:
+            ids, fingerprints = data['id'], data['fingerprint']
+            indptr, buckets, counts = data['indptr'], data['buckets'], data['counts']
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return {}
+    return {(int(i), int(f)): (buckets[indptr[pos]:indptr[pos + 1]], counts[indptr[pos]:indptr[pos + 1]])
+            for pos, (i, f) in enumerate(zip(ids, fingerprints))}
+
+
+def _save(path: str, array: np.ndarray) -> None:
+    """Write next to the target and rename, so readers never see a partial file"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp, path)
+
+
+def _save_terms(path: str, ids, fingerprints, terms) -> None:
+    """Store term vectors sparsely: each title's buckets and counts, concatenated"""
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(buckets) for buckets, _ in terms])
+    empty = np.zeros(0, dtype=np.uint16)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, id=ids, fingerprint=fingerprints, indptr=indptr,
+                 buckets=np.concatenate([b for b, _ in terms] or [empty]),
+                 counts=np.concatenate([c for _, c in terms] or [empty]))
+    os.replace(tmp, path)
+
+
+def _features(rows, terms) -> Tuple[Tuple[np.ndarray, np.ndarray, np.ndarray], np.ndarray, np.ndarray]:
+    """Unit-length TF-IDF text rows (CSR indptr, buckets, weights), unit-length genre rows and ratings scaled to 0..1"""
+    n = len(rows)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(buckets) for buckets, _ in terms])
+    empty = np.zeros(0, dtype=np.uint16)
+    buckets = np.concatenate([b for b, _ in terms] or [empty]).astype(np.intp)
+    counts = np.concatenate([c for _, c in terms] or [empty]).astype(np.float32)
+    # Sublinear TF-IDF over hashed description terms
+    idf = (np.log((1 + n) / (1 + np.bincount(buckets, minlength=HASH_DIM))) + 1).astype(np.float32)
+    weights = (1 + np.log(counts)) * idf[buckets]
+    row_of = np.repeat(np.arange(n), np.diff(indptr))
+    norms = np.sqrt(np.bincount(row_of, weights=np.square(weights, dtype=np.float64), minlength=n))
+    weights /= np.where(norms == 0, 1, norms)[row_of].astype(np.float32)
+    text = (indptr, buckets, weights)
+
+    masks = np.array([row[2] or 0 for row in rows], dtype=np.int64)
+    genres = ((masks[:, None] >> np.arange(len(GENRE_BITS))) & 1).astype(np.float32)
+    _normalize(genres)
+    ratings = np.clip(np.array([row[3] or 0 for row in rows], dtype=np.float32) / 10, 0, 1)
+    return text, genres, ratings
+
+
+def _normalize(matrix: np.ndarray) -> None:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+
+def _dense(text, positions: np.ndarray) -> np.ndarray:
+    """The rows of the sparse text matrix at positions, as a dense float32 matrix"""
+    indptr, buckets, weights = text
+    starts = indptr[positions]
+    lengths = indptr[positions + 1] - starts
+    # Flat offsets of every stored entry of those rows, in row order
+    take = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    dense = np.zeros((len(positions), HASH_DIM), dtype=np.float32)
+    dense[np.repeat(np.arange(len(positions)), lengths), buckets[take]] = weights[take]
+    return dense
+
+
+def _pair_scores(block: np.ndarray, text, genres: np.ndarray) -> np.ndarray:
+    """Symmetric part of the score between the titles at block and every title"""
+    n = len(genres)
+    query = _dense(text, block)
+    scores = np.empty((len(block), n), dtype=np.float32)
+    for start in range(0, n, TEXT_CHUNK_ROWS):
+        stop = min(start + TEXT_CHUNK_ROWS, n)
+        scores[:, start:stop] = query @ _dense(text, np.arange(start, stop)).T
+    scores *= TEXT_WEIGHT
+    scores += GENRE_WEIGHT * (genres[block] @ genres.T)
+    return scores
+
+
+def _top(ids: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best k (ids, scores) per row of scores, best first; -inf columns become id -1"""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+    top_ids = np.take_along_axis(ids[top], order, axis=1)
+    top_ids[np.isneginf(top_scores)] = -1
+    return top_ids, top_scores
+
+
+def _rescore(index, positions: np.ndarray, ids, text, genres, ratings, k: int) -> None:
+    """Recompute the whole neighbour list of the titles at positions"""
+    for start in range(0, len(positions), BLOCK_ROWS):
+        block = positions[start:start + BLOCK_ROWS]
+        scores = _pair_scores(block, text, genres)
+        scores += RATING_WEIGHT * ratings
+        # A title is never its own neighbour
+        scores[np.arange(len(block)), block] = -np.inf
+        index['neighbors'][block, :k], index['scores'][block, :k] = _top(ids, scores, k)
+
+
+def _merge(index, positions: np.ndarray, candidates: np.ndarray, ids, text, genres, ratings, k: int) -> None:
+    """Offer the titles at candidates to the existing neighbour lists of the titles at positions"""
+    for start in range(0, len(candidates), BLOCK_ROWS):
+        block = candidates[start:start + BLOCK_ROWS]
+        # Scores are symmetric apart from the neighbour's rating, so score the small side
+        offered = _pair_scores(block, text, genres)[:, positions].T
+        offered += RATING_WEIGHT * ratings[block]
+        merged_ids = np.concatenate([index['neighbors'][positions, :k], np.broadcast_to(ids[block], offered.shape)], axis=1)
+        merged = np.concatenate([index['scores'][positions, :k], offered], axis=1)
+        merged[merged_ids < 0] = -np.inf
+        top = np.argsort(-merged, axis=1, kind='stable')[:, :k]
+        index['neighbors'][positions, :k] = np.take_along_axis(merged_ids, top, axis=1)
+        index['scores'][positions, :k] = np.take_along_axis(merged, top, axis=1)
+
+
+def build_index(conn, table: str, directory: str, top_k: int = TOP_K, full: bool = False) -> Dict[str, int]:
+    """Bring the top-K neighbour table for movies or series up to date
+
+    Term vectors are kept per title fingerprint (description and genres), so
+    only new or edited descriptions are tokenized again. When few titles
+    changed, only their neighbour lists, and the lists that pointed at a
+    changed or removed title, are recomputed; the new titles are then offered
+    to every other list. Lists left alone keep the IDF weights and ratings
+    of the build that scored them until the next full rebuild, which happens
+    once more than FULL_REBUILD_FRACTION of the titles need rescoring (or
+    when full is set).
+    """
+    rows = conn.execute(f'SELECT id, description, genre_mask, rating FROM {table} ORDER BY id').fetchall()
+    n = len(rows)
+    ids = np.array([row[0] for row in rows], dtype=np.int32)
+    fingerprints = np.array([_fingerprint(row[1], row[2]) for row in rows], dtype=np.uint32)
+
+    current = _load(index_path(directory, table))
+    if current is not None and current.dtype != index_dtype(top_k):
+        current = None
+    if current is not None and not full and np.array_equal(current['id'], ids) and np.array_equal(current['fingerprint'], fingerprints):
+        return {'rows': n, 'vectorized': 0, 'rescored': 0, 'rebuilt': 0}
+
+    cached = _load_terms(_term_path(directory, table))
+    terms = []
+    vectorized = 0
+    for row, fingerprint in zip(rows, fingerprints):
+        hit = cached.get((row[0], int(fingerprint)))
+        if hit is None:
+            hit = _term_counts(row[1])
+            vectorized += 1
+        terms.append(hit)
+    del cached
+
+    index = np.zeros(n, dtype=index_dtype(top_k))
+    index['id'] = ids
+    index['fingerprint'] = fingerprints
+    index['neighbors'] = -1
+    index['scores'] = -np.inf
+    k = min(top_k, n - 1)
+    everything = np.arange(n)
+    rescore, offer = everything, None
+
+    if current is not None and len(current) and k > 0 and not full:
+        old_pos = np.minimum(np.searchsorted(current['id'], ids), len(current) - 1)
+        known = current['id'][old_pos] == ids
+        changed = ~known | (current['fingerprint'][old_pos] != fingerprints)
+        # Scores against edited or removed titles are out of date wherever they appear
+        stale = np.setdiff1d(current['id'], ids[known & ~changed])
+        dirty = changed.copy()
+        dirty[known] |= np.isin(current['neighbors'][old_pos[known]], stale).any(axis=1)
+        if dirty.sum() <= FULL_REBUILD_FRACTION * n:
+            index['neighbors'][known] = current['neighbors'][old_pos[known]]
+            index['scores'][known] = current['scores'][old_pos[known]]
+            rescore, offer = everything[dirty], (everything[~dirty], everything[changed])
+    del current
+
+    if k > 0:
+        text, genres, ratings = _features(rows, terms)
+        _rescore(index, rescore, ids, text, genres, ratings, k)
+        if offer is not None and len(offer[0]) and len(offer[1]):
+            _merge(index, offer[0], offer[1], ids, text, genres, ratings, k)
+
+    os.makedirs(directory, exist_ok=True)
+    _save_terms(_term_path(directory, table), ids, fingerprints, terms)
+    _save(index_path(directory, table), index)
+    return {'rows': n, 'vectorized': vectorized, 'rescored': len(rescore) if k > 0 else 0, 'rebuilt': 1}
+
+
+def build_all(conn, directory: str, top_k: int = TOP_K, full: bool = False) -> Dict[str, Dict[str, int]]:
+    """Update (or fully rebuild) the movie and series neighbour tables; return a report per table"""
+    started = time.monotonic()
+    report = {table: build_index(conn, table, directory, top_k, full) for table in ('movies', 'series')}
+    report['seconds'] = round(time.monotonic() - started, 3)
+    return report
+
+
+class SimilarityIndex:
+    """Memory-mapped neighbour table for one catalog table, reopened after each rebuild"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # (file stamp, mapped array, id -> row position), swapped as one tuple
+        self._state = (None, None, {})
+        self._lock = threading.Lock()
+
+    def _current(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None, {}
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        state = self._state
+        if stamp != state[0]:
+            with self._lock:
+                state = self._state
+                if stamp != state[0]:
+                    data = _load(self.path)
+                    rows = {} if data is None else {int(item_id): pos for pos, item_id in enumerate(data['id'])}
+                    state = self._state = (stamp, data, rows)
+        return state[1], state[2]
+
+    def neighbors(self, item_id: int, limit: int = 6) -> List[int]:
+        """Ids of the most similar titles, best first; empty if the title is not indexed"""
+        data, rows = self._current()
+        pos = rows.get(item_id)
+        if pos is None:
+            return []
+        return [int(i) for i in data['neighbors'][pos][:limit] if i >= 0]
+
+
+if __name__ == '__main__':
+    import sqlite3
+    import sys
+
+    # --full rescores every title, e.g. to pick up rating changes that incremental builds skip
+    full = '--full' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--full']
+    db_path = args[0] if args else os.path.join('instance', 'cinego.db')
+    directory = args[1] if len(args) > 1 else os.path.join('instance', 'similarity')
+    conn = sqlite3.connect(db_path)
+    report = build_all(conn, directory, full=full)
+    conn.close()
+    for table in ('movies', 'series'):
+        r = report[table]
+        print(f"{table}: {r['rows']} titles, {r['vectorized']} vectorized, {r['rescored']} rescored, "
+              f"{'rebuilt' if r['rebuilt'] else 'unchanged'}")
+    print(f"Done in {report['seconds']}s")
@@ -4,10 +4,88 @@ class CineBotWidget {
     constructor() {
         this.isOpen = false;
         this.messages = [];
+        // Cursor for the next page of older history (null when there is none)
+        this.historyBefore = null;
+        this.loadingHistory = false;
+        // Replies being streamed over /events, keyed by stream id
+        this.streams = {};
+        this.events = null;
         this.initWidget();
         this.loadChatHistory();
     }
 
+    // The stream is held only while the chat panel is open: each one occupies a server
+    // thread for its lifetime, and closed panels get warnings from the heartbeat replies
+    connectEvents() {
+        if (!window.EventSource || this.events !== null) return;
+
+        this.events = new EventSource('/events');
+
+        // Reply pieces for a message sent from this page
+        this.events.addEventListener('chat_delta', (e) => {
+            const data = JSON.parse(e.data);
+            const stream = this.streams[data.id];
+            if (!stream) return;
+
+            this.hideTyping();
+            stream.text += data.delta;
+            this.renderStream(stream);
+        });
+
+        // The whole reply once it is saved, with any watch-time warning
+        this.events.addEventListener('chat_done', (e) => {
+            const data = JSON.parse(e.data);
+            this.finishStream(data.id, data);
+        });
+
+        // Pushed as soon as a watch-time threshold is crossed, from any tab
+        this.events.addEventListener('watch_warning', (e) => {
+            const data = JSON.parse(e.data);
+            this.showWatchWarning(data.message);
+        });
+    }
+
+    disconnectEvents() {
+        if (this.events === null) return;
+        this.events.close();
+        this.events = null;
+        // Replies still in flight are saved server-side and show up in the history
+        Object.values(this.streams).forEach(stream => clearTimeout(stream.timer));
+        this.streams = {};
+    }
+
+    eventsConnected() {
+        return this.events !== null && this.events.readyState === EventSource.OPEN;
+    }
+
+    finishStream(id, data) {
+        const stream = this.streams[id];
+        if (!stream) return;
+        delete this.streams[id];
+        clearTimeout(stream.timer);
+        this.hideTyping();
+
+        if (data.error) {
+            this.displayMessage("Oops! Something went wrong. Try again?", true);
+            return;
+        }
+        stream.text = data.response;
+        this.renderStream(stream);
+        if (data.watch_warning) {
+            this.showWatchWarning(data.watch_warning);
+        }
+    }
+
+    renderStream(stream) {
+        if (!stream.element) {
+            stream.element = this.displayMessage('', true);
+        }
+        stream.element.querySelector('.message-content').innerHTML = this.formatMessage(stream.text);
+
+        const messagesContainer = document.getElementById('cinebot-messages');
+        messagesContainer.scrollTop = messagesContainer.scrollHeight;
+    }
+
     initWidget() {
         // Add widget HTML to page
         const widgetHTML = `
@@ -92,6 +170,13 @@ class CineBotWidget {
             this.sendMessage();
         });
 
+        // Load older history when scrolled to the top
+        document.getElementById('cinebot-messages').addEventListener('scroll', (e) => {
+            if (e.target.scrollTop < 40 && this.historyBefore !== null) {
+                this.loadOlderHistory();
+            }
+        });
+
         // Quick action buttons
         document.querySelectorAll('.quick-action-btn').forEach(btn => {
             btn.addEventListener('click', () => {
@@ -110,8 +195,10 @@ class CineBotWidget {
             window.classList.add('active');
             document.getElementById('cinebot-notification').style.display = 'none';
             document.getElementById('cinebot-input').focus();
+            this.connectEvents();
         } else {
             window.classList.remove('active');
+            this.disconnectEvents();
         }
     }
 
@@ -128,12 +215,39 @@ class CineBotWidget {
                 data.history.forEach(msg => {
                     this.displayMessage(msg.message, msg.is_bot, false);
                 });
+                this.historyBefore = data.next_before;
             }
         } catch (error) {
             console.error('Failed to load chat history:', error);
         }
     }
 
+    async loadOlderHistory() {
+        if (this.loadingHistory) return;
+        this.loadingHistory = true;
+
+        try {
+            const response = await fetch(`/chat/history?before=${this.historyBefore}`);
+            const data = await response.json();
+
+            if (data.success) {
+                const messagesContainer = document.getElementById('cinebot-messages');
+                // Keep the visible messages in place while older ones are prepended
+                const previousHeight = messagesContainer.scrollHeight;
+
+                data.history.slice().reverse().forEach(msg => {
+                    this.displayMessage(msg.message, msg.is_bot, false, 'afterbegin');
+                });
+                messagesContainer.scrollTop += messagesContainer.scrollHeight - previousHeight;
+                this.historyBefore = data.next_before;
+            }
+        } catch (error) {
+            console.error('Failed to load older chat history:', error);
+        } finally {
+            this.loadingHistory = false;
+        }
+    }
+
     async sendMessage() {
         const input = document.getElementById('cinebot-input');
         const message = input.value.trim();
@@ -149,6 +263,12 @@ class CineBotWidget {
         // Show typing indicator
         this.showTyping();
 
+        // Ask for the reply to be streamed when the event channel is up
+        const streamId = this.eventsConnected() ? `${Date.now()}-${Math.random().toString(36).slice(2)}` : null;
+        if (streamId) {
+            this.streams[streamId] = { text: '', element: null, timer: null };
+        }
+
         try {
             // Send to backend
             const response = await fetch('/chat', {
@@ -156,11 +276,21 @@ class CineBotWidget {
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ message })
+                body: JSON.stringify({ message, stream_id: streamId })
             });
 
             const data = await response.json();
 
+            if (data.success && data.streamed) {
+                // The reply arrives over /events and chat_done settles it; stop waiting if it never does
+                const stream = this.streams[streamId];
+                if (stream) {
+                    stream.timer = setTimeout(() => this.finishStream(streamId, { error: true }), 30000);
+                }
+                return;
+            }
+            delete this.streams[streamId];
+
             // Hide typing indicator
             this.hideTyping();
 
@@ -177,13 +307,14 @@ class CineBotWidget {
             }
 
         } catch (error) {
+            delete this.streams[streamId];
             this.hideTyping();
             this.displayMessage("Sorry, I'm having connection issues. Please try again!", true);
             console.error('Chat error:', error);
         }
     }
 
-    displayMessage(text, isBot, scroll = true) {
+    displayMessage(text, isBot, scroll = true, position = 'beforeend') {
         const messagesContainer = document.getElementById('cinebot-messages');
         
         const messageHTML = `
@@ -197,12 +328,14 @@ class CineBotWidget {
             </div>
         `;
 
-        messagesContainer.insertAdjacentHTML('beforeend', messageHTML);
+        messagesContainer.insertAdjacentHTML(position, messageHTML);
 
         // Auto-scroll to bottom
         if (scroll) {
             messagesContainer.scrollTop = messagesContainer.scrollHeight;
         }
+
+        return position === 'afterbegin' ? messagesContainer.firstElementChild : messagesContainer.lastElementChild;
     }
 
     formatMessage(text) {
@@ -280,43 +413,68 @@ document.addEventListener('DOMContentLoaded', function() {
 if (window.location.pathname.startsWith('/watch/')) {
     let watchStartTime = Date.now();
     let movieId = parseInt(window.location.pathname.split('/').pop());
+    let pendingHeartbeats = [];
 
-    // Update watch time every 2 minutes
-    setInterval(async () => {
-        const currentTime = Date.now();
-        const minutesWatched = Math.floor((currentTime - watchStartTime) / 60000);
+    // Record whole minutes watched since the last heartbeat
+    const queueHeartbeat = () => {
+        const minutesWatched = Math.floor((Date.now() - watchStartTime) / 60000);
 
         if (minutesWatched > 0) {
-            try {
-                const response = await fetch('/update_watch_time', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        movie_id: movieId,
-                        minutes: minutesWatched
-                    })
-                });
+            pendingHeartbeats.push({ movie_id: movieId, minutes: minutesWatched });
+            // Keep the leftover seconds for the next heartbeat
+            watchStartTime += minutesWatched * 60000;
+        }
+    };
 
-                const data = await response.json();
-                
-                if (data.success && data.warning) {
-                    // Show warning in CineBot if it exists
-                    if (window.cineBot) {
-                        cineBot.showWatchWarning(data.warning);
-                        cineBot.showNotification();
-                    }
-                }
+    // Send every queued heartbeat in one request
+    const flushHeartbeats = async () => {
+        queueHeartbeat();
+        if (pendingHeartbeats.length === 0) return;
+
+        const heartbeats = pendingHeartbeats;
+        pendingHeartbeats = [];
+
+        try {
+            const response = await fetch('/update_watch_time/batch', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ heartbeats })
+            });
 
-                // Reset start time
-                watchStartTime = currentTime;
+            const data = await response.json();
 
-            } catch (error) {
-                console.error('Failed to update watch time:', error);
+            if (data.success && data.warning) {
+                // Show warning in CineBot if it exists (already pushed if the event channel is up)
+                if (cineBot && !cineBot.eventsConnected()) {
+                    cineBot.showWatchWarning(data.warning);
+                    cineBot.showNotification();
+                }
             }
+
+        } catch (error) {
+            // Retry these minutes with the next batch
+            pendingHeartbeats = heartbeats.concat(pendingHeartbeats);
+            console.error('Failed to update watch time:', error);
+        }
+    };
+
+    // Heartbeat every minute, send the batch every 2 minutes
+    setInterval(queueHeartbeat, 60000);
+    setInterval(flushHeartbeats, 120000);
+
+    // Don't lose the last few minutes when the viewer leaves the page
+    window.addEventListener('pagehide', () => {
+        queueHeartbeat();
+        if (pendingHeartbeats.length > 0) {
+            navigator.sendBeacon(
+                '/update_watch_time/batch',
+                new Blob([JSON.stringify({ heartbeats: pendingHeartbeats })], { type: 'application/json' })
+            );
+            pendingHeartbeats = [];
         }
-    }, 120000); // Every 2 minutes
+    });
 }
 
 console.log('🎬 CineBot AI system loaded!');
@@ -30,33 +30,129 @@ document.addEventListener('DOMContentLoaded', function() {
 
     images.forEach(img => imageObserver.observe(img));
 
-    // Movie card click handler
-    const movieCards = document.querySelectorAll('.movie-card');
-    movieCards.forEach(card => {
-        card.addEventListener('click', function() {
+    // Movie card click handler (delegated so paginated cards get it too)
+    document.addEventListener('click', function(e) {
+        const card = e.target.closest('.movie-card');
+        if (card) {
             // Add click animation
-            this.style.transform = 'scale(0.98)';
+            card.style.transform = 'scale(0.98)';
             setTimeout(() => {
-                this.style.transform = '';
+                card.style.transform = '';
             }, 200);
-        });
+        }
     });
 
-    // Search functionality (if search input exists)
+    // Infinite scroll: grids with a page URL fetch the next keyset page near the bottom
+    document.querySelectorAll('.movie-grid[data-page-url]').forEach(grid => {
+        if (!grid.dataset.nextCursor) return;
+
+        const sentinel = document.createElement('div');
+        sentinel.className = 'scroll-sentinel';
+        grid.after(sentinel);
+
+        let loading = false;
+        const pageObserver = new IntersectionObserver(async (entries) => {
+            if (!entries[0].isIntersecting || loading || !grid.dataset.nextCursor) return;
+            loading = true;
+
+            try {
+                const url = new URL(grid.dataset.pageUrl, window.location.origin);
+                url.searchParams.set('after', grid.dataset.nextCursor);
+                url.searchParams.set('html', '1');
+
+                const response = await fetch(url);
+                const data = await response.json();
+
+                if (data.success) {
+                    grid.insertAdjacentHTML('beforeend', data.html);
+                    grid.dataset.nextCursor = data.next_cursor || '';
+                }
+                if (!data.success || !data.next_cursor) {
+                    pageObserver.disconnect();
+                    sentinel.remove();
+                }
+            } catch (error) {
+                console.error('Failed to load more titles:', error);
+            } finally {
+                loading = false;
+            }
+        }, { rootMargin: '600px 0px' });
+
+        pageObserver.observe(sentinel);
+    });
+
+    // Search functionality (if search input exists): ranked server-side full-text search
     const searchInput = document.querySelector('#search-input');
-    if (searchInput) {
-        searchInput.addEventListener('input', function(e) {
-            const searchTerm = e.target.value.toLowerCase();
-            const movieCards = document.querySelectorAll('.movie-card');
-            
-            movieCards.forEach(card => {
-                const title = card.querySelector('.movie-title').textContent.toLowerCase();
-                if (title.includes(searchTerm)) {
-                    card.style.display = '';
+    const searchResults = document.querySelector('#search-results');
+    if (searchInput && searchResults) {
+        let searchTimer = null;
+        let searchController = null;
+        let searchPage = 1;
+
+        const escapeHTML = (value) => String(value ?? '').replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        })[c]);
+
+        const runSearch = async (append = false) => {
+            const query = searchInput.value.trim();
+            if (!query) {
+                searchResults.classList.remove('active');
+                searchResults.innerHTML = '';
+                return;
+            }
+
+            // Drop any request still in flight for an older query
+            if (searchController) searchController.abort();
+            searchController = new AbortController();
+            searchPage = append ? searchPage + 1 : 1;
+
+            try {
+                const url = `/search?q=${encodeURIComponent(query)}&page=${searchPage}`;
+                const response = await fetch(url, { signal: searchController.signal });
+                const data = await response.json();
+                if (!data.success) return;
+
+                const items = data.results.map(item => `
+                    <a href="${escapeHTML(item.url)}" class="search-result">
+                        <img src="${escapeHTML(item.thumb_url || item.image_url)}" alt="" loading="lazy">
+                        <span class="search-result-title">${escapeHTML(item.title)}</span>
+                        <span class="search-result-meta">${item.kind === 'series' ? 'Series' : 'Movie'} • ${escapeHTML(item.year)} • <i class="fas fa-star"></i> ${escapeHTML(item.rating)}</span>
+                    </a>
+                `).join('');
+
+                searchResults.querySelector('.search-more')?.remove();
+                if (append) {
+                    searchResults.insertAdjacentHTML('beforeend', items);
                 } else {
-                    card.style.display = 'none';
+                    searchResults.innerHTML = items || '<div class="search-empty">No matches found</div>';
                 }
-            });
+                if (data.has_more) {
+                    searchResults.insertAdjacentHTML('beforeend', '<button type="button" class="search-more">More results</button>');
+                }
+                searchResults.classList.add('active');
+            } catch (error) {
+                if (error.name !== 'AbortError') {
+                    console.error('Search failed:', error);
+                }
+            }
+        };
+
+        searchInput.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => runSearch(), 150);
+        });
+
+        searchResults.addEventListener('click', function(e) {
+            if (e.target.closest('.search-more')) {
+                e.preventDefault();
+                runSearch(true);
+            }
+        });
+
+        document.addEventListener('click', function(e) {
+            if (!e.target.closest('.search-box')) {
+                searchResults.classList.remove('active');
+            }
         });
     }
 
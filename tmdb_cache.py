@@ -0,0 +1,146 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Any, Optional, Tuple
+
+
+class ResponseCache:
+    """SQLite-backed, size-bounded LRU cache for TMDB response bodies keyed by URL"""
+
+    # (path pattern, TTL in seconds); first match wins
+    ENDPOINT_TTLS = [
+        (re.compile(r'/(movie|tv)/\d+/videos'), 7 * 24 * 3600),
+        (re.compile(r'/trending/'), 3600),
+        (re.compile(r'/movie/now_playing'), 6 * 3600),
+        (re.compile(r'/movie/upcoming'), 6 * 3600),
+        (re.compile(r'/tv/popular'), 6 * 3600),
+        (re.compile(r'/movie/top_rated'), 24 * 3600),
+        (re.compile(r'/discover/'), 24 * 3600),
+    ]
+    DEFAULT_TTL = 3600
+    # Cache hits pending a last_access write; flushed with the next write or once this many pile up
+    ACCESS_FLUSH_SIZE = 256
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # url -> last hit time, kept in memory so a hit costs no disk write
+        self._accessed: Dict[str, float] = {}
+        # Opened on first use by each process, so a fork never shares the SQLite handle
+        self._conn = None
+        self._pid = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """This process's connection; call with self._lock held"""
+        if self._pid != os.getpid():
+            self._conn = self._open()
+            self._pid = os.getpid()
+        return self._conn
+
+    def _open(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)')
+        conn.commit()
+        return conn
+
+    @classmethod
+    def ttl_for(cls, url: str) -> int:
+        """Return the freshness lifetime for a URL based on its endpoint"""
+        for pattern, ttl in cls.ENDPOINT_TTLS:
+            if pattern.search(url):
+                return ttl
+        return cls.DEFAULT_TTL
+
+    def get(self, url: str) -> Optional[Tuple[bytes, Dict[str, str], bool]]:
+        """Return (body, validator headers, is_fresh) for a cached URL, or None"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                'SELECT body, etag, last_modified, expires_at FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[url] = now
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_access(conn)
+                conn.commit()
+
+        body, etag, last_modified, expires_at = row
+        validators = {}
+        if etag:
+            validators['If-None-Match'] = etag
+        if last_modified:
+            validators['If-Modified-Since'] = last_modified
+        return zlib.decompress(body), validators, expires_at > now
+
+    def put(self, url: str, body: bytes, headers: Dict[str, Any]) -> None:
+        """Store a response body with its validators and evict down to max_bytes"""
+        now = time.time()
+        compressed = zlib.compress(body)
+        with self._lock:
+            conn = self._connection()
+            conn.execute('''
+                INSERT OR REPLACE INTO responses (url, body, etag, last_modified, expires_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (url, compressed, headers.get('ETag'), headers.get('Last-Modified'),
+                  now + self.ttl_for(url), now, len(compressed)))
+            self._flush_access(conn)
+            self._evict(conn)
+            conn.commit()
+
+    def touch(self, url: str) -> None:
+        """Extend a cached entry's freshness after a 304 revalidation"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute('UPDATE responses SET expires_at = ?, last_access = ? WHERE url = ?',
+                         (now + self.ttl_for(url), now, url))
+            conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM responses')
+            conn.commit()
+            self._accessed.clear()
+
+    def _flush_access(self, conn) -> None:
+        """Write the batched hit times that LRU eviction orders by"""
+        if self._accessed:
+            conn.executemany('UPDATE responses SET last_access = MAX(last_access, ?) WHERE url = ?',
+                             [(at, url) for url, at in self._accessed.items()])
+            self._accessed.clear()
+
+    def _evict(self, conn) -> None:
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        cursor = conn.execute('SELECT url, size FROM responses ORDER BY last_access')
+        victims = []
+        for url, size in cursor:
+            if total <= self.max_bytes:
+                break
+            victims.append((url,))
+            total -= size
+        conn.executemany('DELETE FROM responses WHERE url = ?', victims)
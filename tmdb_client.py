@@ -1,7 +1,56 @@
 
+import json
 import requests
 import random
-from typing import List, Dict, Any
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from requests.adapters import HTTPAdapter
+from typing import List, Dict, Any, Optional
+
+from genres import GENRE_NAMES, genre_mask
+from tmdb_cache import ResponseCache
+
+
+class TMDBError(Exception):
+    """Raised when a TMDB request still fails after all retries"""
+
+    def __init__(self, url: str, reason: str):
+        super().__init__(f"TMDB request failed for {url}: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to stay under TMDB's request rate limit"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Drain the bucket so every caller backs off for the given time"""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
 
 class TMDBClient:
     """Client for TMDB API interactions"""
@@ -19,15 +68,157 @@ class TMDBClient:
             "accept": "application/json"
         }
 
+    # Shared keep-alive session so parallel fetches reuse pooled connections
+    POOL_SIZE = 10
+    _session = None
+    _session_lock = threading.Lock()
+
+    @classmethod
+    def configure_pool(cls, size: int) -> None:
+        """Resize the connection pool; a no-op when the size is unchanged"""
+        size = max(1, int(size))
+        with cls._session_lock:
+            if size == cls.POOL_SIZE:
+                return
+            cls.POOL_SIZE = size
+            # Not closed: requests still in flight on the old session finish on its connections,
+            # which are released once nothing references it; the next get_session() builds anew
+            cls._session = None
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        """Return the shared HTTP session, creating it on first use"""
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=cls.POOL_SIZE, pool_maxsize=cls.POOL_SIZE)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.headers.update(cls._get_headers())
+                    cls._session = session
+        return cls._session
+
+    # TMDB allows roughly 50 requests/second per IP; stay a little below it
+    RATE_LIMIT = 40
+    RATE_BURST = 40
+    _bucket = TokenBucket(RATE_LIMIT, RATE_BURST)
+
+    REQUEST_TIMEOUT = 10
+    MAX_RETRIES = 4
+    BACKOFF_BASE = 0.5
+    BACKOFF_MAX = 30
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    @classmethod
+    def configure_rate_limit(cls, rate: float, burst: int) -> None:
+        """Replace the client-side token bucket"""
+        cls.RATE_LIMIT = rate
+        cls.RATE_BURST = burst
+        cls._bucket = TokenBucket(rate, burst)
+
+    @classmethod
+    def _retry_after(cls, response: requests.Response) -> Optional[float]:
+        """Parse a Retry-After header given either as seconds or as an HTTP date"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+    @classmethod
+    def _backoff(cls, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(cls.BACKOFF_MAX, cls.BACKOFF_BASE * (2 ** attempt)))
+
+    @classmethod
+    def _get(cls, url: str, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """GET a TMDB URL, retrying 429/5xx and connection errors with backoff"""
+        reason = ''
+        for attempt in range(cls.MAX_RETRIES + 1):
+            cls._bucket.acquire()
+            try:
+                response = cls.get_session().get(url, headers=headers, timeout=cls.REQUEST_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                reason = str(e)
+                delay = cls._backoff(attempt)
+            else:
+                if response.status_code not in cls.RETRY_STATUSES:
+                    if response.status_code not in (200, 304, 404):
+                        print(f"TMDB returned {response.status_code} for {url}")
+                    return response
+                reason = f"HTTP {response.status_code}"
+                retry_after = cls._retry_after(response)
+                delay = retry_after if retry_after is not None else cls._backoff(attempt)
+                if response.status_code == 429:
+                    # A 429 applies to the whole client, not just this thread; the paused
+                    # bucket holds the retry back in acquire(), so don't sleep here as well.
+                    # Capped like the sleep below: one huge Retry-After must not stall every caller
+                    cls._bucket.pause(min(delay, cls.BACKOFF_MAX))
+                    continue
+
+            if attempt < cls.MAX_RETRIES:
+                time.sleep(min(delay, cls.BACKOFF_MAX))
+        raise TMDBError(url, reason)
+
+    # Optional on-disk response cache; see configure_cache
+    _cache = None
+
+    @classmethod
+    def configure_endpoints(cls, base_url: Optional[str] = None, image_base_url: Optional[str] = None) -> None:
+        """Point the client at another TMDB-compatible API and/or poster host; None keeps the current one"""
+        if base_url:
+            cls.BASE_URL = base_url.rstrip('/')
+        if image_base_url:
+            cls.IMAGE_BASE_URL = image_base_url.rstrip('/')
+
+    @classmethod
+    def configure_cache(cls, path: Optional[str], max_bytes: int = 50 * 1024 * 1024) -> None:
+        """Enable the on-disk response cache at path, or disable it with None"""
+        cls._cache = ResponseCache(path, max_bytes) if path else None
+
+    @classmethod
+    def _get_json(cls, url: str) -> Optional[Dict[str, Any]]:
+        """Return the decoded JSON body for url, served from cache when fresh"""
+        cache = cls._cache
+        cached = cache.get(url) if cache else None
+        if cached:
+            body, validators, fresh = cached
+            if fresh:
+                return json.loads(body)
+            try:
+                response = cls._get(url, headers=validators)
+            except TMDBError as e:
+                # Stale beats nothing: revalidate again on the next call
+                print(f"Serving stale TMDB response: {e}")
+                return json.loads(body)
+            if response.status_code == 304:
+                cache.touch(url)
+                return json.loads(body)
+        else:
+            response = cls._get(url)
+
+        if response.status_code != 200:
+            return None
+        if cache:
+            cache.put(url, response.content, response.headers)
+        return response.json()
 
     @classmethod
     def fetch_trending_movies(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch trending movies for the week"""
         url = f"{cls.BASE_URL}/trending/movie/week?page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             return [cls._process_movie(m) for m in results[:limit]]
         return []
 
@@ -35,10 +226,10 @@ class TMDBClient:
     def fetch_top_rated_movies(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch top rated movies"""
         url = f"{cls.BASE_URL}/movie/top_rated?page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             return [cls._process_movie(m) for m in results[:limit]]
         return []
 
@@ -46,10 +237,10 @@ class TMDBClient:
     def fetch_now_playing_movies(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch now playing movies"""
         url = f"{cls.BASE_URL}/movie/now_playing?page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             return [cls._process_movie(m) for m in results[:limit]]
         return []
     
@@ -57,10 +248,10 @@ class TMDBClient:
     def fetch_upcoming_movies(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch upcoming movies"""
         url = f"{cls.BASE_URL}/movie/upcoming?page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             # For upcoming, we should filter out those without posters to look good
             results = [m for m in results if m.get('poster_path')]
             return [cls._process_movie(m) for m in results[:limit]]
@@ -70,10 +261,10 @@ class TMDBClient:
     def fetch_action_movies(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch action movies specifically"""
         url = f"{cls.BASE_URL}/discover/movie?with_genres=28&page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             return [cls._process_movie(m) for m in results[:limit]]
         return []
     
@@ -81,10 +272,10 @@ class TMDBClient:
     def fetch_comedy_movies(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch comedy movies specifically"""
         url = f"{cls.BASE_URL}/discover/movie?with_genres=35&page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             return [cls._process_movie(m) for m in results[:limit]]
         return []
 
@@ -92,10 +283,10 @@ class TMDBClient:
     def fetch_popular_series(cls, page: int = 1, limit: int = 20) -> List[Dict[str, Any]]:
         """Fetch popular TV series"""
         url = f"{cls.BASE_URL}/tv/popular?page={page}"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             return [cls._process_series(s) for s in results[:limit]]
         return []
 
@@ -103,10 +294,10 @@ class TMDBClient:
     def fetch_movie_videos(cls, movie_id: int) -> Dict[str, str]:
         """Fetch best available video (Trailer first)"""
         url = f"{cls.BASE_URL}/movie/{movie_id}/videos"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             
             # Priority: Trailer > Teaser > Clip
             for video in results:
@@ -134,10 +325,10 @@ class TMDBClient:
     def fetch_series_videos(cls, series_id: int) -> Dict[str, str]:
         """Fetch best available video for series (Trailer first)"""
         url = f"{cls.BASE_URL}/tv/{series_id}/videos"
-        response = requests.get(url, headers=cls._get_headers())
+        data = cls._get_json(url)
         
-        if response.status_code == 200:
-            results = response.json().get('results', [])
+        if data is not None:
+            results = data.get('results', [])
             
             # Priority: Trailer > Teaser > Clip
             for video in results:
@@ -164,17 +355,15 @@ class TMDBClient:
         """Convert TMDB movie data to our application format"""
         
         genre_ids = data.get('genre_ids', [])
-        # Map primary genre
+        # Map primary genre for display; every genre goes into the bitmask
         genre = cls._get_genre_name(genre_ids[0]) if genre_ids else 'Unknown'
         
-        # We can also store full genre list if DB supported it, but schema is simple string.
-        # Let's keep it simple for now.
-        
         return {
             'id': data.get('id'),
             'title': data.get('title'),
             'year': int(data.get('release_date', '0000')[:4]) if data.get('release_date') else 0,
             'genre': genre,
+            'genre_mask': genre_mask(genre_ids),
             'rating': data.get('vote_average', 0),
             'image_url': f"{cls.IMAGE_BASE_URL}{data.get('poster_path')}" if data.get('poster_path') else "",
             'description': data.get('overview', ''),
@@ -194,6 +383,7 @@ class TMDBClient:
             'title': data.get('name'),
             'year': int(data.get('first_air_date', '0000')[:4]) if data.get('first_air_date') else 0,
             'genre': genre,
+            'genre_mask': genre_mask(data.get('genre_ids') or []),
             'rating': data.get('vote_average', 0),
             'image_url': f"{cls.IMAGE_BASE_URL}{data.get('poster_path')}" if data.get('poster_path') else "",
             'description': data.get('overview', ''),
@@ -203,12 +393,5 @@ class TMDBClient:
     @classmethod
     def _get_genre_name(cls, genre_id: int) -> str:
         # Basic mapping for common TMDB genre IDs
-        genres = {
-            28: 'Action', 12: 'Adventure', 16: 'Animation', 35: 'Comedy',
-            80: 'Crime', 99: 'Documentary', 18: 'Drama', 10751: 'Family',
-            14: 'Fantasy', 36: 'History', 27: 'Horror', 10402: 'Music',
-            9648: 'Mystery', 10749: 'Romance', 878: 'Sci-Fi', 10770: 'TV Movie',
-            53: 'Thriller', 10752: 'War', 37: 'Western'
-        }
-        return genres.get(genre_id, 'Drama')
+        return GENRE_NAMES.get(genre_id, 'Drama')
 
@@ -2,6 +2,8 @@
 import sqlite3
 import os
 
+from migrations import check_query_plans, current_version
+
 db_path = os.path.join("instance", "cinego.db")
 if not os.path.exists(db_path):
     print("DB file not found!")
@@ -36,4 +38,14 @@ with open("verify_result_phase3.txt", "w") as f:
     except Exception as e:
         f.write(f"Error fetching sample: {e}\n")
 
+    # Hot queries must be served by their indexes
+    try:
+        f.write(f"\nSchema version: {current_version(conn)}\n")
+        failures = check_query_plans(conn)
+        for sql, plan in failures:
+            f.write(f"Index not used: {sql}\n    {plan}\n")
+        f.write(f"Query plans OK: {not failures}\n")
+    except Exception as e:
+        f.write(f"Error checking query plans: {e}\n")
+
 conn.close()
@@ -0,0 +1,105 @@
+import atexit
+import os
+import threading
+from collections import Counter
+
+
+class ViewCounter:
+    """Buffers movie view increments in memory and flushes them in batched transactions
+
+    Every process keeps its own buffer and writes relative deltas
+    (view_count = view_count + n), so several workers can flush into the
+    same database without losing or double-counting views.
+    """
+
+    def __init__(self, connect, flush_interval: float = 0.5, max_pending: int = 200):
+        self.connect = connect
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+        atexit.register(self.stop)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        # The parent still owns whatever it had buffered; start clean
+        self._pending = Counter()
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self) -> None:
+        """Start the flush thread (again, if this process was forked)"""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='view-counter', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flush thread and write out anything still buffered"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def increment(self, movie_id: int, n: int = 1) -> None:
+        """Record a view without touching the database"""
+        with self._lock:
+            self._pending[movie_id] += n
+            self._pending_total += n
+            full = self._pending_total >= self.max_pending
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self.start()
+        if full:
+            self._wakeup.set()
+
+    def pending(self, movie_id: int) -> int:
+        """Views recorded for a movie that have not been flushed yet"""
+        with self._lock:
+            return self._pending.get(movie_id, 0)
+
+    def flush(self) -> int:
+        """Write buffered increments in one transaction; return the number of views written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, Counter()
+                self._pending_total = 0
+            if not batch:
+                return 0
+
+            try:
+                conn = self.connect()
+                try:
+                    with conn:
+                        conn.executemany('UPDATE movies SET view_count = view_count + ? WHERE id = ?',
+                                         [(n, movie_id) for movie_id, n in batch.items()])
+                finally:
+                    conn.close()
+            except Exception as e:
+                # Put the deltas back so the next flush retries them
+                with self._lock:
+                    self._pending.update(batch)
+                    self._pending_total += sum(batch.values())
+                print(f"View count flush error: {str(e)}")
+                return 0
+            return sum(batch.values())
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
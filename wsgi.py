@@ -0,0 +1,10 @@
+"""Production WSGI entry point; see gunicorn.conf.py
+
+Initialization is left to `flask --app app init-db`, run once per
+deployment, and background jobs to start_background_jobs() in the workers.
+"""
+import os
+
+os.environ.setdefault('CINEGO_INIT_ON_IMPORT', '0')
+
+from app import app  # noqa: E402